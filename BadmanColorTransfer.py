@@ -5,6 +5,11 @@ import torch
 from skimage import color
 from skimage.exposure import match_histograms, equalize_adapthist
 
+from .BadmanLogging import get_logger
+
+logger = get_logger("color_transfer")
+
+
 class LabColorTransferNode:
     def __init__(self, device="cpu"):
         self.device = device
@@ -111,16 +116,16 @@ class LabColorTransferNode:
         B = B.astype(np.uint8)
         
         # Print debug information
-        print(f"L shape: {L_adjusted.shape}, dtype: {L_adjusted.dtype}")
-        print(f"A shape: {A.shape}, dtype: {A.dtype}")
-        print(f"B shape: {B.shape}, dtype: {B.dtype}")
+        logger.debug("L shape: %s, dtype: %s", L_adjusted.shape, L_adjusted.dtype)
+        logger.debug("A shape: %s, dtype: %s", A.shape, A.dtype)
+        logger.debug("B shape: %s, dtype: %s", B.shape, B.dtype)
         
         # Create merged image
         try:
             return cv2.merge([L_adjusted, A, B])
         except Exception as e:
-            print(f"Error during merge: {e}")
-            print(f"Unique values in mask: {np.unique(mask)}")
+            logger.error("Error during merge: %s", e)
+            logger.error("Unique values in mask: %s", np.unique(mask))
             raise
 
     def histogram_match_lab(self, img_lab, target_lab, mask, preserve_details):
@@ -149,10 +154,10 @@ class LabColorTransferNode:
         try:
             return cv2.merge([L_adjusted, A, B])
         except Exception as e:
-            print(f"Error during merge: {e}")
-            print(f"L shape: {L_adjusted.shape}, dtype: {L_adjusted.dtype}")
-            print(f"A shape: {A.shape}, dtype: {A.dtype}")
-            print(f"B shape: {B.shape}, dtype: {B.dtype}")
+            logger.error("Error during merge: %s", e)
+            logger.error("L shape: %s, dtype: %s", L_adjusted.shape, L_adjusted.dtype)
+            logger.error("A shape: %s, dtype: %s", A.shape, A.dtype)
+            logger.error("B shape: %s, dtype: %s", B.shape, B.dtype)
             raise
 
     def adaptive_scale_lab(self, img_lab, target_lab, mask, preserve_details):
@@ -189,10 +194,10 @@ class LabColorTransferNode:
         try:
             return cv2.merge([L_adjusted, A, B])
         except Exception as e:
-            print(f"Error during merge: {e}")
-            print(f"L shape: {L_adjusted.shape}, dtype: {L_adjusted.dtype}")
-            print(f"A shape: {A.shape}, dtype: {A.dtype}")
-            print(f"B shape: {B.shape}, dtype: {B.dtype}")
+            logger.error("Error during merge: %s", e)
+            logger.error("L shape: %s, dtype: %s", L_adjusted.shape, L_adjusted.dtype)
+            logger.error("A shape: %s, dtype: %s", A.shape, A.dtype)
+            logger.error("B shape: %s, dtype: %s", B.shape, B.dtype)
             raise
 
     def apply_lab_color_transfer(self, input_image, hex_color, method="original", preserve_details=0.5, mask=None, mask_threshold=0.05):
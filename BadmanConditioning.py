@@ -1,3 +1,71 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+import weakref
+
+import safetensors.torch
+import torch
+
+import folder_paths
+
+from .BadmanLogging import get_logger
+
+logger = get_logger("conditioning")
+
+# Tokenized prompts kept per tokenizer
+TOKENIZE_CACHE_SIZE = 256
+_token_caches = weakref.WeakKeyDictionary()  # tokenizer -> OrderedDict(key -> tokens)
+_token_cache_lock = threading.Lock()
+
+
+def _copy_tokens(tokens):
+    """Copy the dicts and lists of a token structure, the token tuples are shared."""
+    if isinstance(tokens, dict):
+        return {key: _copy_tokens(value) for key, value in tokens.items()}
+    if isinstance(tokens, list):
+        return [_copy_tokens(value) if isinstance(value, (dict, list)) else value for value in tokens]
+    return tokens
+
+
+def cached_tokenize(clip, text, return_word_ids=False):
+    """
+    clip.tokenize with an LRU cache per tokenizer.
+
+    Clones of a CLIP share its tokenizer, so they share the cache too. The
+    key includes the CLIP's tokenizer options. Returns a copy the caller may
+    modify.
+    """
+    tokenizer = getattr(clip, "tokenizer", None)
+    options = getattr(clip, "tokenizer_options", None)
+    try:
+        key = (repr(sorted(options.items())) if options else None, text, return_word_ids)
+        with _token_cache_lock:
+            cache = _token_caches.get(tokenizer)
+            if cache is None:
+                cache = _token_caches[tokenizer] = collections.OrderedDict()
+            tokens = cache.get(key)
+            if tokens is not None:
+                cache.move_to_end(key)
+    except TypeError:
+        # Tokenizer can't be weakly referenced, don't cache
+        return clip.tokenize(text, return_word_ids=return_word_ids)
+
+    if tokens is None:
+        tokens = clip.tokenize(text, return_word_ids=return_word_ids)
+        with _token_cache_lock:
+            cache[key] = tokens
+            while len(cache) > TOKENIZE_CACHE_SIZE:
+                cache.popitem(last=False)
+    return _copy_tokens(tokens)
+
+
+def _pad_tokens(tokens, length, empty):
+    """Append whole copies of the empty token batches until tokens has at least length batches."""
+    if len(tokens) < length and empty:
+        tokens.extend(empty * (-(-(length - len(tokens)) // len(empty))))
+
 
 class BadmanCLIPTextEncodeSDXLRegion:
     def __init__(self):
@@ -13,6 +81,9 @@ class BadmanCLIPTextEncodeSDXLRegion:
             "target_height": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
             "text_g": ("STRING", {"multiline": True, "dynamicPrompts": True}), "clip": ("CLIP", ),
             "text_l": ("STRING", {"multiline": True, "dynamicPrompts": True}), "clip": ("CLIP", ),
+            },
+            "optional": {
+                "print_tokens": ("BOOLEAN", {"default": False}),
             }}
     RETURN_TYPES = ("CLIPREGION",)
     FUNCTION = "encode"
@@ -21,7 +92,7 @@ class BadmanCLIPTextEncodeSDXLRegion:
 
 
     def init_prompt(self, clip, text_g):
-        tokens = clip.tokenize(text_g, return_word_ids=True)
+        tokens = cached_tokenize(clip, text_g, return_word_ids=True)
         return ({
             "clip" : clip,
             "base_tokens" : tokens,
@@ -30,10 +101,10 @@ class BadmanCLIPTextEncodeSDXLRegion:
             "weights" : [],
         },)
 
-    def encode(self, clip, width, height, crop_w, crop_h, target_width, target_height, text_g, text_l):
+    def encode(self, clip, width, height, crop_w, crop_h, target_width, target_height, text_g, text_l, print_tokens=False):
         # Tokenize the global text and store in the "g" key of tokens
-        tokens_g = clip.tokenize(text_g, return_word_ids=True)
-        tokens_l = clip.tokenize(text_l, return_word_ids=True)
+        tokens_g = cached_tokenize(clip, text_g, return_word_ids=True)
+        tokens_l = cached_tokenize(clip, text_l, return_word_ids=True)
         
         # Initialize the tokens dictionary with proper keys
         tokens = {
@@ -43,14 +114,13 @@ class BadmanCLIPTextEncodeSDXLRegion:
 
         # Ensure the length of tokens["l"] matches the length of tokens["g"]
         if len(tokens["l"]) != len(tokens["g"]):
-            empty = clip.tokenize("")
+            empty = cached_tokenize(clip, "")
             empty_l = empty.get("l", empty)  # Fallback to empty if "l" key is not present
             empty_g = empty.get("g", empty)  # Fallback to empty if "g" key is not present
-            while len(tokens["l"]) < len(tokens["g"]):
-                tokens["l"] += empty_l
-            while len(tokens["l"]) > len(tokens["g"]):
-                tokens["g"] += empty_g
-        print(tokens)
+            _pad_tokens(tokens["l"], len(tokens["g"]), empty_l)
+            _pad_tokens(tokens["g"], len(tokens["l"]), empty_g)
+        if print_tokens:
+            logger.info("%s", tokens)
         return ({
             "clip": clip,
             "base_tokens": tokens,
@@ -75,4 +145,383 @@ class BadmanCLIPTextEncodeSDXLRegion:
                 "regions" : [],
                 "targets" : [],
                 "weights" : [],
-            },)"""
\ No newline at end of file
+            },)"""
+
+# Encoded conditioning kept per text encoder in RAM, see ConditioningCache
+CONDITIONING_CACHE_SIZE = 64
+# Values sampled from each tensor for the disk cache fingerprints
+_FINGERPRINT_SAMPLES = 4096
+
+
+class _UnstableFingerprint(Exception):
+    pass
+
+
+def _fingerprint(obj, digest):
+    """Feed a restart-stable description of obj into digest, tensors by shape, dtype and sampled values."""
+    if isinstance(obj, torch.Tensor):
+        flat = obj.detach().reshape(-1)
+        step = max(1, flat.numel() // _FINGERPRINT_SAMPLES)
+        digest.update(f"{tuple(obj.shape)}{obj.dtype}".encode())
+        digest.update(flat[::step].to("cpu", torch.float32).numpy().tobytes())
+    elif isinstance(obj, (list, tuple)):
+        digest.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for value in obj:
+            _fingerprint(value, digest)
+    elif isinstance(obj, dict):
+        digest.update(f"dict{len(obj)}".encode())
+        for key in sorted(obj, key=repr):
+            digest.update(repr(key).encode())
+            _fingerprint(obj[key], digest)
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        digest.update(repr(obj).encode())
+    elif hasattr(obj, "weights"):
+        # Weight adapters (LoRA, LoHa, ...) of newer ComfyUI versions
+        digest.update(type(obj).__name__.encode())
+        _fingerprint(obj.weights, digest)
+    else:
+        raise _UnstableFingerprint(type(obj).__name__)
+
+
+def has_clip_hooks(clip):
+    """True for CLIPs with hooks or a clip schedule, their conds change over the sampling steps."""
+    return bool(getattr(clip, "apply_hooks_to_conds", None)) or bool(getattr(clip, "use_clip_schedule", False))
+
+
+class ConditioningCache:
+    """
+    LRU cache of encoded prompt tensors, with an optional safetensors disk tier.
+
+    The RAM tier keeps CONDITIONING_CACHE_SIZE entries per text encoder
+    model in a WeakKeyDictionary, so entries go away with the model, and is
+    keyed by the CLIP's patches (patches_uuid), clip layer and tokenizer
+    options plus the prompt. The disk tier survives restarts and is keyed by
+    a sha256 of sampled model and patch weights instead; CLIPs whose patches
+    can't be fingerprinted only use the RAM tier. Disk files beyond the size
+    limit are deleted oldest first.
+
+    Tensors are stored as returned by the encoder (normally on the CPU), so
+    the cache works without a GPU.
+    """
+
+    def __init__(self, max_entries=CONDITIONING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = weakref.WeakKeyDictionary()  # cond_stage_model -> OrderedDict(key -> tensors)
+        self._model_fingerprints = weakref.WeakKeyDictionary()  # cond_stage_model -> hex digest or None
+        self._patch_fingerprints = {}  # patches_uuid -> hex digest or None
+        self._lock = threading.Lock()
+        self.ram_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cacheable(clip):
+        # Hooked or scheduled CLIPs encode differently per step, skip them
+        return (getattr(clip, "cond_stage_model", None) is not None and getattr(clip, "patcher", None) is not None
+                and not has_clip_hooks(clip))
+
+    def _clip_settings(self, clip):
+        options = getattr(clip, "tokenizer_options", None)
+        return (clip.layer_idx, repr(sorted(options.items())) if options else None)
+
+    def _disk_key(self, clip, key):
+        model = clip.cond_stage_model
+        with self._lock:
+            model_fingerprint = self._model_fingerprints.get(model, False)
+            patches_uuid = getattr(clip.patcher, "patches_uuid", None)
+            patch_fingerprint = self._patch_fingerprints.get(patches_uuid, False)
+        if model_fingerprint is False:
+            digest = hashlib.sha256(type(model).__name__.encode())
+            try:
+                _fingerprint(model.state_dict(), digest)
+                model_fingerprint = digest.hexdigest()
+            except Exception:
+                model_fingerprint = None
+            with self._lock:
+                self._model_fingerprints[model] = model_fingerprint
+        if patch_fingerprint is False:
+            digest = hashlib.sha256()
+            try:
+                _fingerprint(clip.patcher.patches, digest)
+                patch_fingerprint = digest.hexdigest()
+            except Exception:
+                patch_fingerprint = None
+            with self._lock:
+                self._patch_fingerprints[patches_uuid] = patch_fingerprint
+        if model_fingerprint is None or patch_fingerprint is None:
+            return None
+        return hashlib.sha256(repr((model_fingerprint, patch_fingerprint) + key).encode()).hexdigest()
+
+    def get(self, clip, key, disk_dir=None):
+        """Cached tensors (a dict) for clip and key, or None."""
+        key = self._clip_settings(clip) + key
+        ram_key = (getattr(clip.patcher, "patches_uuid", None),) + key
+        with self._lock:
+            entries = self._entries.get(clip.cond_stage_model)
+            tensors = entries.get(ram_key) if entries is not None else None
+            if tensors is not None:
+                entries.move_to_end(ram_key)
+                self.ram_hits += 1
+                return tensors
+        if disk_dir is not None:
+            disk_key = self._disk_key(clip, key)
+            file_path = os.path.join(disk_dir, f"{disk_key}.safetensors") if disk_key else None
+            if file_path is not None and os.path.isfile(file_path):
+                try:
+                    tensors = safetensors.torch.load_file(file_path)
+                    os.utime(file_path)
+                except Exception as e:
+                    logger.warning("Could not read cached conditioning %s: %s", file_path, e)
+                else:
+                    self._put_ram(clip, ram_key, tensors)
+                    with self._lock:
+                        self.disk_hits += 1
+                    return tensors
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, clip, key, tensors, disk_dir=None, disk_limit_bytes=0):
+        key = self._clip_settings(clip) + key
+        self._put_ram(clip, (getattr(clip.patcher, "patches_uuid", None),) + key, tensors)
+        if disk_dir is None or disk_limit_bytes <= 0:
+            # A file written to a folder limited to 0 bytes would be trimmed right away
+            return
+        disk_key = self._disk_key(clip, key)
+        if disk_key is None:
+            return
+        file_path = os.path.join(disk_dir, f"{disk_key}.safetensors")
+        try:
+            os.makedirs(disk_dir, exist_ok=True)
+            safetensors.torch.save_file({name: tensor.detach().contiguous().cpu() for name, tensor in tensors.items()}, file_path)
+        except Exception as e:
+            logger.warning("Could not write cached conditioning %s: %s", file_path, e)
+            return
+        self._trim_disk(disk_dir, disk_limit_bytes)
+
+    def _put_ram(self, clip, ram_key, tensors):
+        with self._lock:
+            entries = self._entries.get(clip.cond_stage_model)
+            if entries is None:
+                entries = self._entries[clip.cond_stage_model] = collections.OrderedDict()
+            entries[ram_key] = tensors
+            entries.move_to_end(ram_key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    @staticmethod
+    def _disk_files(disk_dir):
+        files = []
+        with os.scandir(disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".safetensors") and entry.is_file():
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _trim_disk(self, disk_dir, disk_limit_bytes):
+        """Delete the least recently used files until the folder fits disk_limit_bytes."""
+        files = sorted(self._disk_files(disk_dir))
+        total = sum(size for _, size, _ in files)
+        for _, size, file_path in files:
+            if total <= disk_limit_bytes:
+                break
+            try:
+                os.remove(file_path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self, disk_dir=None):
+        with self._lock:
+            stats = {
+                "ram_hits": self.ram_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "ram_entries": sum(len(entries) for entries in self._entries.values()),
+            }
+        if disk_dir is not None and os.path.isdir(disk_dir):
+            files = self._disk_files(disk_dir)
+            stats["disk_entries"] = len(files)
+            stats["disk_mb"] = round(sum(size for _, size, _ in files) / (1024 * 1024), 2)
+        return stats
+
+
+CONDITIONING_CACHE = ConditioningCache()
+
+
+def conditioning_cache_dir():
+    """Folder of the conditioning disk cache, in the ComfyUI user directory."""
+    get_directory = getattr(folder_paths, "get_user_directory", folder_paths.get_temp_directory)
+    return os.path.join(get_directory(), "badman_conditioning_cache")
+
+
+def tokenize_region_prompts(clip, prompts):
+    """
+    Tokenize (text_g, text_l) prompts into one token list.
+
+    Each prompt's g and l token batches are padded with empty batches to the
+    longer of the two, then the prompts are concatenated, each keeping its
+    own number of 77 token sections.
+
+    Returns:
+        tuple: (tokens with all prompts' batches concatenated, batches per prompt)
+    """
+    empty = cached_tokenize(clip, "")
+    empty_l = empty.get("l", empty)
+    empty_g = empty.get("g", empty)
+    tokens = {"g": [], "l": []}
+    counts = []
+    for text_g, text_l in prompts:
+        tokens_g = cached_tokenize(clip, text_g)
+        tokens_l = cached_tokenize(clip, text_l)
+        g = tokens_g.get("g", tokens_g)
+        l = tokens_l.get("l", tokens_l)
+        length = max(len(g), len(l))
+        _pad_tokens(g, length, empty_g)
+        _pad_tokens(l, length, empty_l)
+        tokens["g"].extend(g[:length])
+        tokens["l"].extend(l[:length])
+        counts.append(length)
+    return tokens, counts
+
+
+def encode_region_prompts(clip, prompts, cache=None, disk_dir=None, disk_limit_bytes=0):
+    """
+    Encode many (text_g, text_l) prompts with a single CLIP encode.
+
+    The prompts are tokenized together (tokenize_region_prompts) and encoded
+    as one token list; the text encoders already batch all 77 token sections
+    of a token list, so N prompts cost about one encode of their sections.
+    The output is split back into one cond per prompt by its section count,
+    so every prompt gets the same cond as encoding it alone.
+
+    The pooled output of an encode is the one of its first section, so it
+    belongs to the first prompt; callers put their base prompt first.
+
+    With a ConditioningCache the encoded tensors are looked up and stored
+    there (disk_dir enables its disk tier).
+
+    Returns:
+        tuple: (list of cond tensors, one per prompt, pooled output)
+    """
+    if not prompts:
+        return [], None
+    use_cache = cache is not None and cache.cacheable(clip)
+    key = ("sdxl", tuple(prompts))
+    tensors = cache.get(clip, key, disk_dir) if use_cache else None
+    if tensors is None:
+        tokens, counts = tokenize_region_prompts(clip, prompts)
+        cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
+        tensors = {"cond": cond, "sections": torch.tensor(counts)}
+        if pooled is not None:
+            tensors["pooled_output"] = pooled
+        if use_cache:
+            cache.put(clip, key, tensors, disk_dir, disk_limit_bytes)
+    cond = tensors["cond"]
+    counts = tensors["sections"].tolist()
+    section_length = cond.shape[1] // sum(counts)
+    return list(cond.split([count * section_length for count in counts], dim=1)), tensors.get("pooled_output")
+
+
+def encode_scheduled(clip, text_g, text_l, add_dict):
+    """
+    Uncached SDXL encode for CLIPs with hooks.
+
+    Goes through encode_from_tokens_scheduled so the conditioning keeps the
+    hook schedule, like CLIPTextEncodeSDXL. Returns CONDITIONING.
+    """
+    tokens, _ = tokenize_region_prompts(clip, [(text_g, text_l)])
+    return clip.encode_from_tokens_scheduled(tokens, add_dict=add_dict)
+
+
+class BadmanCLIPTextEncodeSDXLRegionBatch:
+    def __init__(self):
+        pass
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {
+            "clip": ("CLIP", ),
+            "width": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "height": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "crop_w": ("INT", {"default": 0, "min": 0, "max": 4096}),
+            "crop_h": ("INT", {"default": 0, "min": 0, "max": 4096}),
+            "target_width": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "target_height": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "text_g": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+            "text_l": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+            "regions_g": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+            },
+            "optional": {
+                "regions_l": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+            }}
+    RETURN_TYPES = ("CONDITIONING", "CONDITIONING",)
+    RETURN_NAMES = ("base", "regions",)
+    OUTPUT_IS_LIST = (False, True,)
+    FUNCTION = "encode"
+
+    CATEGORY = "Badman"
+
+    def encode(self, clip, width, height, crop_w, crop_h, target_width, target_height, text_g, text_l, regions_g, regions_l=""):
+        # One region prompt per non-empty line, regions_l lines default to the regions_g ones
+        lines_g = [line.strip() for line in regions_g.splitlines() if line.strip()]
+        lines_l = [line.strip() for line in regions_l.splitlines() if line.strip()]
+        prompts = [(text_g, text_l)]
+        prompts.extend((line, lines_l[i] if i < len(lines_l) else line) for i, line in enumerate(lines_g))
+        info = {"width": width, "height": height, "crop_w": crop_w, "crop_h": crop_h,
+                "target_width": target_width, "target_height": target_height}
+
+        if has_clip_hooks(clip):
+            # One scheduled encode per prompt keeps the hooks, regions still share the base pooled output
+            conditionings = [encode_scheduled(clip, text_g, text_l, info) for text_g, text_l in prompts]
+            for conditioning in conditionings[1:]:
+                for entry, base_entry in zip(conditioning, conditionings[0]):
+                    entry[1]["pooled_output"] = base_entry[1].get("pooled_output")
+            return (conditionings[0], conditionings[1:],)
+
+        conds, pooled = encode_region_prompts(clip, prompts, CONDITIONING_CACHE)
+        # Regions share the base prompt's pooled output
+        info["pooled_output"] = pooled
+        conditionings = [[[cond, info.copy()]] for cond in conds]
+        return (conditionings[0], conditionings[1:],)
+
+
+class BadmanCLIPTextEncodeSDXLCached:
+    def __init__(self):
+        pass
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {
+            "clip": ("CLIP", ),
+            "width": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "height": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "crop_w": ("INT", {"default": 0, "min": 0, "max": 4096}),
+            "crop_h": ("INT", {"default": 0, "min": 0, "max": 4096}),
+            "target_width": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "target_height": ("INT", {"default": 1024.0, "min": 0, "max": 4096}),
+            "text_g": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+            "text_l": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+            },
+            "optional": {
+                "disk_cache": ("BOOLEAN", {"default": False}),
+                "disk_limit_mb": ("INT", {"default": 1024, "min": 0, "max": 1048576, "tooltip": "Size limit of the disk cache folder, 0 turns the disk cache off"}),
+            }}
+    RETURN_TYPES = ("CONDITIONING", "STRING",)
+    RETURN_NAMES = ("conditioning", "cache_stats",)
+    FUNCTION = "encode"
+
+    CATEGORY = "Badman"
+
+    def encode(self, clip, width, height, crop_w, crop_h, target_width, target_height, text_g, text_l, disk_cache=False, disk_limit_mb=1024):
+        disk_dir = conditioning_cache_dir() if disk_cache and disk_limit_mb > 0 else None
+        info = {"width": width, "height": height, "crop_w": crop_w, "crop_h": crop_h,
+                "target_width": target_width, "target_height": target_height}
+        if has_clip_hooks(clip):
+            return (encode_scheduled(clip, text_g, text_l, info), json.dumps(CONDITIONING_CACHE.stats(disk_dir)),)
+        conds, pooled = encode_region_prompts(clip, [(text_g, text_l)], CONDITIONING_CACHE, disk_dir, disk_limit_mb * 1024 * 1024)
+        conditioning = [[conds[0], dict(info, pooled_output=pooled)]]
+        return (conditioning, json.dumps(CONDITIONING_CACHE.stats(disk_dir)),)
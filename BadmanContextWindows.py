@@ -0,0 +1,554 @@
+"""
+BadmanContextWindows.py
+Context window conditioning resizing for WAN models using concat_latent_image.
+"""
+
+import collections
+import copy
+import inspect
+import os
+import time
+import types
+
+import torch
+import comfy.context_windows
+import comfy.patcher_extension
+
+from .BadmanLogging import get_logger
+
+logger = get_logger("context_windows")
+
+
+# Signature of IndexListContextHandler.get_resized_cond these patches were written against
+_EXPECTED_SIGNATURE = ["self", "cond_in", "x_in", "window", "device"]
+_WRAPPER_KEY = "badman_context_window_cond_cache"
+
+
+def context_window_patch_supported():
+    """
+    Check that the installed ComfyUI exposes the context window API the patches expect.
+
+    Returns:
+        bool: True if get_resized_cond has the expected signature and the
+        OUTER_SAMPLE wrapper type is available
+    """
+    handler_cls = getattr(comfy.context_windows, "IndexListContextHandler", None)
+    if handler_cls is None or not hasattr(handler_cls, "get_resized_cond"):
+        return False
+    params = list(inspect.signature(handler_cls.get_resized_cond).parameters)
+    if params != _EXPECTED_SIGNATURE:
+        return False
+    return hasattr(comfy.patcher_extension.WrappersMP, "OUTER_SAMPLE")
+
+
+def fixed_get_resized_cond(self, cond_in, x_in, window, device=None):
+    """
+    get_resized_cond with the nested dict check fixed for WAN concat_latent_image.
+
+    Nested tensors are sliced when self.dim < ndim and size(self.dim) matches
+    x_in, the same rule as top-level tensors.
+    """
+    if cond_in is None:
+        return None
+
+    resized_cond = []
+    for actual_cond in cond_in:
+        resized_actual_cond = actual_cond.copy()
+        for key in actual_cond:
+            try:
+                cond_item = actual_cond[key]
+                if isinstance(cond_item, torch.Tensor):
+                    if self.dim < cond_item.ndim and cond_item.size(self.dim) == x_in.size(self.dim):
+                        actual_cond_item = window.get_tensor(cond_item)
+                        resized_actual_cond[key] = actual_cond_item.to(device)
+                    else:
+                        resized_actual_cond[key] = cond_item.to(device)
+                elif key == "control":
+                    resized_actual_cond[key] = self.prepare_control_objects(cond_item, device)
+                elif isinstance(cond_item, dict):
+                    new_cond_item = cond_item.copy()
+                    for cond_key, cond_value in new_cond_item.items():
+                        if isinstance(cond_value, torch.Tensor):
+                            # FIX: Changed from cond_value.ndim < self.dim to self.dim < cond_value.ndim
+                            # and from size(0) to size(self.dim) to match top-level tensor logic
+                            if self.dim < cond_value.ndim and cond_value.size(self.dim) == x_in.size(self.dim):
+                                new_cond_item[cond_key] = window.get_tensor(cond_value, device)
+                            else:
+                                new_cond_item[cond_key] = cond_value.to(device) if device else cond_value
+                        elif hasattr(cond_value, "cond") and isinstance(cond_value.cond, torch.Tensor):
+                            if self.dim < cond_value.cond.ndim and cond_value.cond.size(self.dim) == x_in.size(self.dim):
+                                new_cond_item[cond_key] = cond_value._copy_with(window.get_tensor(cond_value.cond, device))
+                        elif cond_key == "num_video_frames":
+                            new_cond_item[cond_key] = cond_value._copy_with(cond_value.cond)
+                            new_cond_item[cond_key].cond = window.context_length
+                    resized_actual_cond[key] = new_cond_item
+                else:
+                    resized_actual_cond[key] = cond_item
+            finally:
+                del cond_item
+        resized_cond.append(resized_actual_cond)
+    return resized_cond
+
+
+class ContextWindowCondCache:
+    """
+    Caches device copies of step-invariant cond tensors for context windows.
+
+    Cond tensors such as concat_latent_image do not change between sampling
+    steps, so they only have to be moved to the device once per sampling run.
+    Tensors that fit in resident_budget_bytes are copied to the device in full
+    and every window is sliced from that copy on the device. Larger tensors
+    are streamed: each window's slice is copied on its own and kept in a ring
+    of the last stream_windows windows, so the slice and its pinned host
+    buffer are released once the following windows have been consumed.
+    Everything cached, resident copies and streamed slices alike, counts
+    against the budget. The cache is dropped by end_run().
+
+    On CUDA devices the copies go through pinned memory with
+    non_blocking=True, and the next window's streamed slices are prefetched
+    on a side stream while the current window samples. Without CUDA
+    everything runs synchronously.
+    """
+
+    def __init__(self, resident_budget_bytes=0, history_size=1024, stream_windows=2):
+        self.resident_budget_bytes = resident_budget_bytes
+        self.stream_windows = stream_windows
+        # (index list, device) -> {source id: [slice, cuda event or None, pinned host buffer or None]},
+        # oldest window first
+        self._streamed = collections.OrderedDict()
+        # (source id, device) -> full copy of the source on the device
+        self._resident = {}
+        self._cached_bytes = 0
+        self.peak_cached_bytes = 0
+        # Keeps the source tensors alive so their ids stay unique for the run
+        self._sources = {}
+        self._streams = {}
+        self._next_window = {}
+        self._used_async = False
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        self.bytes_moved = 0
+        self.ops_executed = 0
+        self.resize_seconds = 0.0
+        self._plans = {}
+        self._step_start = (0, 0, 0, 0, 0, 0.0)
+        self.step_history = collections.deque(maxlen=history_size)
+
+    @staticmethod
+    def _is_async(device):
+        return device is not None and torch.device(device).type == "cuda" and torch.cuda.is_available()
+
+    def _fits(self, nbytes):
+        return self._cached_bytes + nbytes <= self.resident_budget_bytes
+
+    def _add_cached(self, nbytes):
+        self._cached_bytes += nbytes
+        self.peak_cached_bytes = max(self.peak_cached_bytes, self._cached_bytes)
+
+    def _copy(self, tensor, device):
+        if self._is_async(device):
+            self._used_async = True
+            pinned = tensor if tensor.is_pinned() else tensor.pin_memory()
+            result = pinned.to(device, non_blocking=True)
+        else:
+            result = tensor.to(device)
+        self.bytes_moved += result.nbytes
+        return result
+
+    def _get_resident(self, tensor, device):
+        """Full copy of tensor on device, made once per run if it fits the budget."""
+        key = (id(tensor), device)
+        resident = self._resident.get(key)
+        if resident is not None or not self._fits(tensor.nbytes):
+            return resident
+        self._sources[id(tensor)] = tensor
+        resident = self._resident[key] = self._copy(tensor, device)
+        self._add_cached(tensor.nbytes)
+        return resident
+
+    def _stage_slice(self, tensor, window, dim, device):
+        """Copy the window slice of tensor to device. Returns (slice, pinned host buffer or None)."""
+        if not self._is_async(device):
+            result = window.get_tensor(tensor, device)
+            self.bytes_moved += result.nbytes
+            return result, None
+
+        # Gather straight into a pinned buffer so the copy can run asynchronously
+        index = torch.tensor(window.index_list, dtype=torch.long)
+        shape = list(tensor.shape)
+        shape[dim] = len(window.index_list)
+        host_buffer = torch.empty(shape, dtype=tensor.dtype, pin_memory=True)
+        torch.index_select(tensor, dim, index, out=host_buffer)
+        result = host_buffer.to(device, non_blocking=True)
+        self._used_async = True
+        self.bytes_moved += result.nbytes
+        return result, host_buffer
+
+    def _release(self, slices):
+        # Consumers recorded their stream on the slices and the pinned host
+        # allocator holds the buffers until their copies finished, so dropping
+        # the references is safe while copies may still be in flight
+        for result, _, _ in slices.values():
+            self._cached_bytes -= result.nbytes
+        slices.clear()
+
+    def _stream_slot(self, key, nbytes):
+        """Ring slot of window key with room for nbytes, or None when the budget is used up."""
+        slices = self._streamed.get(key)
+        if slices is None:
+            while len(self._streamed) >= self.stream_windows:
+                self._release(self._streamed.popitem(last=False)[1])
+        if not self._fits(nbytes):
+            return None
+        if slices is None:
+            slices = self._streamed[key] = {}
+        return slices
+
+    def window_slice(self, tensor, window, dim, device):
+        if device is None or tensor.device == torch.device(device):
+            return window.get_tensor(tensor, device)
+
+        resident = self._get_resident(tensor, device)
+        if resident is not None:
+            self.hits += 1
+            return window.get_tensor(resident, device)
+
+        key = (tuple(window.index_list), device)
+        entry = self._streamed.get(key, {}).get(id(tensor))
+        if entry is not None:
+            self.hits += 1
+            result, event = entry[0], entry[1]
+            if event is not None:
+                # Prefetched on the side stream, order it before the consumer
+                current = torch.cuda.current_stream(result.device)
+                current.wait_event(event)
+                result.record_stream(current)
+                entry[1] = None
+            return result
+        self.misses += 1
+        result, host_buffer = self._stage_slice(tensor, window, dim, device)
+        slices = self._stream_slot(key, result.nbytes)
+        if slices is not None:
+            self._sources[id(tensor)] = tensor
+            slices[id(tensor)] = [result, None, host_buffer]
+            self._add_cached(result.nbytes)
+        return result
+
+    def prefetch(self, tensor, window, dim, device):
+        """Start copying the slice of tensor for window to device on a side stream."""
+        if not self._is_async(device):
+            return
+        if (id(tensor), device) in self._resident or self._fits(tensor.nbytes):
+            # Resident, or will become resident on first use, slicing on device needs no copy
+            return
+        key = (tuple(window.index_list), device)
+        if id(tensor) in self._streamed.get(key, {}):
+            return
+        nbytes = tensor.nbytes // tensor.size(dim) * len(window.index_list)
+        slices = self._stream_slot(key, nbytes)
+        if slices is None:
+            return
+
+        stream = self._streams.get(device)
+        if stream is None:
+            stream = self._streams[device] = torch.cuda.Stream(device)
+        self._sources[id(tensor)] = tensor
+        with torch.cuda.stream(stream):
+            result, host_buffer = self._stage_slice(tensor, window, dim, device)
+            event = torch.cuda.Event()
+            event.record(stream)
+        slices[id(tensor)] = [result, event, host_buffer]
+        self._add_cached(result.nbytes)
+        self.prefetches += 1
+
+    def to_device(self, tensor, device):
+        if device is None or tensor.device == torch.device(device):
+            return tensor
+        resident = self._get_resident(tensor, device)
+        if resident is not None:
+            self.hits += 1
+            return resident
+        # Over budget, moved again for every window
+        self.misses += 1
+        return self._copy(tensor, device)
+
+    def plan_for(self, cond_in, dim, x_len):
+        """Return the resize plan for cond_in, compiling it on first use in this run."""
+        plan = self._plans.get(id(cond_in))
+        if plan is None or not plan.matches(cond_in, dim, x_len):
+            plan = CondResizePlan(cond_in, dim, x_len)
+            self._plans[id(cond_in)] = plan
+        return plan
+
+    def next_window(self, window):
+        return self._next_window.get(id(window))
+
+    def begin_step(self, windows):
+        """Record the windows of the new step and close the stats of the previous one."""
+        self._record_step()
+        self._windows = windows
+        self._next_window = {id(a): b for a, b in zip(windows, windows[1:])}
+        # Looped schedules shift the windows every step, slices of windows this
+        # step does not run would never be hit again
+        current = {tuple(window.index_list) for window in windows}
+        for key in [key for key in self._streamed if key[0] not in current]:
+            self._release(self._streamed.pop(key))
+
+    def _record_step(self):
+        hits, misses, prefetches, bytes_moved, ops_executed, resize_seconds = self._step_start
+        step = {
+            "hits": self.hits - hits,
+            "misses": self.misses - misses,
+            "prefetches": self.prefetches - prefetches,
+            "bytes_moved": self.bytes_moved - bytes_moved,
+            "ops": self.ops_executed - ops_executed,
+            "resize_ms": (self.resize_seconds - resize_seconds) * 1000.0,
+        }
+        if step["hits"] or step["misses"] or step["ops"]:
+            self.step_history.append(step)
+        self._step_start = (self.hits, self.misses, self.prefetches, self.bytes_moved,
+                            self.ops_executed, self.resize_seconds)
+
+    def end_run(self):
+        self._record_step()
+        if self._used_async:
+            # Pinned host buffers are freed below, make sure no copy still reads them
+            torch.cuda.synchronize()
+        self._streamed.clear()
+        self._sources.clear()
+        self._plans.clear()
+        self._resident.clear()
+        self._next_window.clear()
+        self._windows = []
+        self._cached_bytes = 0
+        self._used_async = False
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        steps = len(self.step_history)
+        moved_per_step = sum(step["bytes_moved"] for step in self.step_history) / steps if steps else 0.0
+        resize_ms_per_step = sum(step["resize_ms"] for step in self.step_history) / steps if steps else 0.0
+        return (f"context window cond cache: {self.hits} hits, {self.misses} misses "
+                f"({self.hit_rate():.1%} hit rate), {self.prefetches} prefetched, "
+                f"{moved_per_step / 2**20:.2f} MB moved and {resize_ms_per_step:.3f} ms "
+                f"resizing per step over {steps} steps, {self.peak_cached_bytes / 2**20:.2f} MB cached at peak")
+
+
+# Resize plan op codes
+_SLICE = 0
+_MOVE = 1
+_CONTROL = 2
+_SUB_COPY = 3
+_SUB_SLICE = 4
+_SUB_MOVE = 5
+_SUB_SLICE_COND = 6
+_SUB_NUM_FRAMES = 7
+
+
+class CondResizePlan:
+    """
+    get_resized_cond decisions for one cond list, compiled once per sampling run.
+
+    The cond structure and the x_in length along the window dim do not change
+    between steps, so which entries are temporally sliced, moved to the device
+    or passed through is decided once. Resizing a window is then a flat loop
+    over (op, cond index, key, sub key, source) tuples with no dict walking
+    or type checks.
+    """
+
+    def __init__(self, cond_in, dim, x_len):
+        # Holding cond_in keeps its id unique for as long as the plan is cached
+        self.cond_in = cond_in
+        self.dim = dim
+        self.x_len = x_len
+        self.sizes = [len(actual_cond) for actual_cond in cond_in]
+        self.ops = []
+        self.sliced = []
+        for i, actual_cond in enumerate(cond_in):
+            self._compile_cond(i, actual_cond)
+
+    def _is_sliced(self, tensor):
+        return self.dim < tensor.ndim and tensor.size(self.dim) == self.x_len
+
+    def _compile_cond(self, i, actual_cond):
+        ops = self.ops
+        for key, cond_item in actual_cond.items():
+            if isinstance(cond_item, torch.Tensor):
+                if self._is_sliced(cond_item):
+                    ops.append((_SLICE, i, key, None, cond_item))
+                    self.sliced.append(cond_item)
+                else:
+                    ops.append((_MOVE, i, key, None, cond_item))
+            elif key == "control":
+                ops.append((_CONTROL, i, key, None, cond_item))
+            elif isinstance(cond_item, dict):
+                ops.append((_SUB_COPY, i, key, None, cond_item))
+                for cond_key, cond_value in cond_item.items():
+                    if isinstance(cond_value, torch.Tensor):
+                        if self._is_sliced(cond_value):
+                            ops.append((_SUB_SLICE, i, key, cond_key, cond_value))
+                            self.sliced.append(cond_value)
+                        else:
+                            ops.append((_SUB_MOVE, i, key, cond_key, cond_value))
+                    elif hasattr(cond_value, "cond") and isinstance(cond_value.cond, torch.Tensor):
+                        if self._is_sliced(cond_value.cond):
+                            ops.append((_SUB_SLICE_COND, i, key, cond_key, cond_value))
+                            self.sliced.append(cond_value.cond)
+                    elif cond_key == "num_video_frames":
+                        ops.append((_SUB_NUM_FRAMES, i, key, cond_key, cond_value))
+
+    def matches(self, cond_in, dim, x_len):
+        return (self.dim == dim and self.x_len == x_len
+                and self.sizes == [len(actual_cond) for actual_cond in cond_in])
+
+    def execute(self, handler, window, device, cache):
+        dim = self.dim
+        resized_cond = [actual_cond.copy() for actual_cond in self.cond_in]
+        for op, i, key, sub_key, source in self.ops:
+            target = resized_cond[i]
+            if op == _SLICE:
+                target[key] = cache.window_slice(source, window, dim, device)
+            elif op == _MOVE:
+                target[key] = cache.to_device(source, device)
+            elif op == _CONTROL:
+                target[key] = handler.prepare_control_objects(source, device)
+            elif op == _SUB_COPY:
+                target[key] = source.copy()
+            elif op == _SUB_SLICE:
+                target[key][sub_key] = cache.window_slice(source, window, dim, device)
+            elif op == _SUB_MOVE:
+                target[key][sub_key] = cache.to_device(source, device)
+            elif op == _SUB_SLICE_COND:
+                target[key][sub_key] = source._copy_with(cache.window_slice(source.cond, window, dim, device))
+            else:
+                num_frames = source._copy_with(source.cond)
+                num_frames.cond = window.context_length
+                target[key][sub_key] = num_frames
+        return resized_cond
+
+
+def cached_get_resized_cond(self, cond_in, x_in, window, device=None):
+    """
+    Drop-in replacement for fixed_get_resized_cond that runs a cached CondResizePlan.
+
+    Slices come from self.badman_cond_cache, and after resizing the slices
+    needed by the next window are prefetched.
+    """
+    if cond_in is None:
+        return None
+
+    cache = self.badman_cond_cache
+    start = time.perf_counter()
+    plan = cache.plan_for(cond_in, self.dim, x_in.size(self.dim))
+    resized_cond = plan.execute(self, window, device, cache)
+
+    next_window = cache.next_window(window)
+    if next_window is not None:
+        for tensor in plan.sliced:
+            cache.prefetch(tensor, next_window, self.dim, device)
+    cache.ops_executed += len(plan.ops)
+    cache.resize_seconds += time.perf_counter() - start
+    return resized_cond
+
+
+def recording_get_context_windows(self, model, x_in, model_options):
+    """get_context_windows that tells the cond cache which windows this step will run."""
+    windows = type(self).get_context_windows(self, model, x_in, model_options)
+    self.badman_cond_cache.begin_step(windows)
+    return windows
+
+
+def install_cond_cache(handler, resident_budget_bytes=0):
+    """
+    Patch a single context handler instance to use cached_get_resized_cond.
+
+    Only this handler is affected, the IndexListContextHandler class is left alone.
+    """
+    handler.badman_cond_cache = ContextWindowCondCache(resident_budget_bytes)
+    handler.get_resized_cond = types.MethodType(cached_get_resized_cond, handler)
+    if hasattr(type(handler), "get_context_windows"):
+        handler.get_context_windows = types.MethodType(recording_get_context_windows, handler)
+    return handler
+
+
+def _end_run_wrapper(executor, *args, **kwargs):
+    # OUTER_SAMPLE wrapper, releases the cached slices once the sampling run is over
+    try:
+        return executor(*args, **kwargs)
+    finally:
+        handler = executor.class_obj.model_options.get("context_handler")
+        cache = getattr(handler, "badman_cond_cache", None)
+        if cache is not None:
+            cache.end_run()
+            logger.info("%s", cache.summary())
+
+
+def install_global_context_window_fix():
+    """
+    Replace IndexListContextHandler.get_resized_cond for every model with fixed_get_resized_cond.
+
+    Opt-in only (BADMAN_CONTEXT_WINDOW_FIX=1, a warning is logged on import
+    while the variable is unset), and skipped when the ComfyUI context window
+    API does not match the expected version.
+    """
+    if not context_window_patch_supported():
+        logger.warning("Context window API changed, not installing the get_resized_cond fix")
+        return False
+    comfy.context_windows.IndexListContextHandler.get_resized_cond = fixed_get_resized_cond
+    return True
+
+
+_context_window_fix = os.environ.get("BADMAN_CONTEXT_WINDOW_FIX")
+if _context_window_fix == "1":
+    install_global_context_window_fix()
+elif _context_window_fix is None:
+    # Workflows that relied on the fix being installed on import lose it silently otherwise
+    logger.warning("The context window get_resized_cond fix is no longer installed on import. Use the WAN Context Window "
+                   "Cond Cache node, or set BADMAN_CONTEXT_WINDOW_FIX=1 to install it for every model (0 hides this message)")
+
+
+class WanContextWindowCondCache:
+    """
+    Opt-in context window cond resizing with per-run caching for one model.
+
+    Applies the WAN nested cond fix and caches the device copies of
+    step-invariant cond tensors (concat_latent_image, concat_mask, ...) for
+    the whole sampling run. Tensors are kept resident on the device as long
+    as everything cached fits in resident_budget_mb, larger ones are streamed
+    per window with at most two windows of slices held (on CUDA through
+    pinned memory, with the next window prefetched). Connect after the node
+    that sets up context windows on the model.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "model": ("MODEL", {"tooltip": "Model with context windows already configured"}),
+                "resident_budget_mb": ("INT", {"default": 1024, "min": 0, "max": 65536, "step": 64, "tooltip": "Device memory the cond cache may occupy. Tensors that fit are kept on the device in full, larger ones are streamed per window with at most two windows of slices cached"}),
+            }
+        }
+
+    RETURN_TYPES = ("MODEL",)
+    RETURN_NAMES = ("model",)
+    FUNCTION = "patch"
+    CATEGORY = "video/wan"
+
+    def patch(self, model, resident_budget_mb=1024):
+        if model.model_options.get("context_handler") is None:
+            raise ValueError("Model has no context window handler, connect this node after a context windows node")
+
+        if not context_window_patch_supported():
+            logger.warning("Context window API changed, passing model through without the cond cache")
+            return (model,)
+
+        model = model.clone()
+        # Copy the handler so the cache never leaks into the source model
+        handler = install_cond_cache(copy.copy(model.model_options["context_handler"]), resident_budget_mb * 2**20)
+        model.model_options["context_handler"] = handler
+        model.add_wrapper_with_key(comfy.patcher_extension.WrappersMP.OUTER_SAMPLE, _WRAPPER_KEY, _end_run_wrapper)
+        return (model,)
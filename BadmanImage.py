@@ -362,3 +362,135 @@ class RandomColorImageGrid:
 
         # Return the batch of images
         return (torch.stack(images),)
+
+
+def parse_index_spec(spec, length):
+    """
+    Parse a batch selection like "3", "-1", "2:10", "::2" or "0,4,8:12".
+
+    Python-style indices and slices, negative values count from the end.
+    A single index or a single range with a positive step is returned as a
+    slice (so it can be taken as a view), anything else as a list of indices.
+    """
+    parts = [part.strip() for part in spec.split(",") if part.strip()]
+    if not parts:
+        raise ValueError("Empty selection")
+    selections = []
+    for part in parts:
+        try:
+            if ":" in part:
+                values = [int(value) if value.strip() else None for value in part.split(":")]
+                if len(values) > 3:
+                    raise ValueError
+                selections.append(slice(*values))
+            else:
+                index = int(part)
+                if not -length <= index < length:
+                    raise IndexError(f"Index {index} is out of bounds for batch of length {length}")
+                index %= length
+                selections.append(slice(index, index + 1))
+        except ValueError:
+            raise ValueError(f"Invalid selection '{part}', use an index, start:stop[:step] or a comma separated list")
+    if len(selections) == 1 and (selections[0].step or 1) > 0:
+        return selections[0]
+    indices = []
+    for selection in selections:
+        indices.extend(range(*selection.indices(length)))
+    return indices
+
+
+def select_batch(tensor, spec, dim=0, contiguous=False):
+    """
+    Select entries of tensor along dim by a parse_index_spec selection.
+
+    Slices are returned as views (narrow or strided slicing) unless
+    contiguous is set; index lists are gathered with one index_select.
+    """
+    selection = parse_index_spec(spec, tensor.shape[dim])
+    if isinstance(selection, slice):
+        start, stop, step = selection.indices(tensor.shape[dim])
+        if step == 1:
+            selected = tensor.narrow(dim, start, max(0, stop - start))
+        else:
+            selected = tensor[(slice(None),) * dim + (slice(start, stop, step),)]
+        if contiguous:
+            selected = selected.contiguous()
+    else:
+        selected = tensor.index_select(dim, torch.tensor(selection, dtype=torch.long, device=tensor.device))
+    if selected.shape[dim] == 0:
+        raise ValueError(f"Selection '{spec}' is empty for batch of length {tensor.shape[dim]}")
+    return selected
+
+
+class SelectImageFrames:
+    """
+    Select images from an IMAGE batch by index, slice or index list.
+
+    Works on the batch tensor directly: single indices and ranges are
+    views, index lists one gather into a new contiguous batch.
+    """
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "images": ("IMAGE",),
+                "frames": ("STRING", {"default": "0", "tooltip": "Index, start:stop[:step] or comma separated list, e.g. 0,4,8:12 or -1"}),
+            },
+            "optional": {
+                "contiguous": ("BOOLEAN", {"default": False, "tooltip": "Copy ranges into a contiguous batch instead of returning a view"}),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "INT",)
+    RETURN_NAMES = ("images", "count",)
+    FUNCTION = "execute"
+    CATEGORY = "Badman"
+
+    def execute(self, images, frames, contiguous=False):
+        selected = select_batch(images, frames, 0, contiguous)
+        return (selected, selected.shape[0],)
+
+
+class SelectLatentFrames:
+    """
+    Select latents from a LATENT batch, or frames of a video latent, by
+    index, slice or index list without splitting the batch.
+    """
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "samples": ("LATENT",),
+                "frames": ("STRING", {"default": "0", "tooltip": "Index, start:stop[:step] or comma separated list, e.g. 0,4,8:12 or -1"}),
+                "dim": (["batch", "frames"], {"tooltip": "frames selects latent frames of video latents (B, C, T, H, W)"}),
+            },
+            "optional": {
+                "contiguous": ("BOOLEAN", {"default": False, "tooltip": "Copy ranges into a contiguous batch instead of returning a view"}),
+            }
+        }
+
+    RETURN_TYPES = ("LATENT", "INT",)
+    RETURN_NAMES = ("samples", "count",)
+    FUNCTION = "execute"
+    CATEGORY = "Badman"
+
+    def execute(self, samples, frames, dim, contiguous=False):
+        latent = samples["samples"]
+        if dim == "frames":
+            if latent.dim() != 5:
+                raise ValueError(f"Selecting frames needs a video latent (B, C, T, H, W), got shape {tuple(latent.shape)}")
+            axis = 2
+        else:
+            axis = 0
+
+        out = samples.copy()
+        out["samples"] = select_batch(latent, frames, axis, contiguous)
+        # Keep per-entry extras in step with the selection
+        noise_mask = samples.get("noise_mask")
+        if noise_mask is not None and noise_mask.dim() == latent.dim() and noise_mask.shape[axis] == latent.shape[axis]:
+            out["noise_mask"] = select_batch(noise_mask, frames, axis, contiguous)
+        if axis == 0 and "batch_index" in samples:
+            selection = parse_index_spec(frames, latent.shape[0])
+            indices = range(*selection.indices(latent.shape[0])) if isinstance(selection, slice) else selection
+            out["batch_index"] = [samples["batch_index"][i] for i in indices]
+        return (out, out["samples"].shape[axis],)
@@ -0,0 +1,179 @@
+"""
+Logging for the Badman nodes.
+
+Every module logs through get_logger(). Records are put on a queue and
+written by a background thread (QueueListener), so nodes never block on
+console or file I/O. The console handler truncates huge messages and rate
+limits each call site; the level comes from BADMAN_LOG_LEVEL (default INFO).
+Values printed on request (log_output) skip both the level and the rate limit.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+LOGGER_NAME = "BadmanNodes"
+# Longest message written to the console, longer ones are cut
+MAX_CONSOLE_MESSAGE_LENGTH = int(os.environ.get("BADMAN_LOG_MAX_CHARS", "4000"))
+# Console messages allowed per call site and interval (seconds)
+RATE_LIMIT_MESSAGES = 20
+RATE_LIMIT_INTERVAL = 10.0
+# Rotating log files kept open, the least recently used one is closed beyond this
+MAX_OPEN_LOG_FILES = 8
+
+_setup_lock = threading.Lock()
+_listener = None
+_file_handlers = OrderedDict()  # absolute path -> RotatingFileHandler, least recently used first
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Formatter that cuts messages longer than max_length characters."""
+
+    def __init__(self, fmt=None, max_length=MAX_CONSOLE_MESSAGE_LENGTH):
+        super().__init__(fmt)
+        self.max_length = max_length
+
+    def formatMessage(self, record):
+        message = record.message
+        if self.max_length and len(message) > self.max_length:
+            record.message = f"{message[:self.max_length]}... [{len(message) - self.max_length} more characters]"
+        try:
+            return super().formatMessage(record)
+        finally:
+            record.message = message
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `messages` records per call site through every `interval` seconds.
+
+    The first record after a suppressed stretch reports how many were dropped.
+    Records logged with extra={"badman_user_output": True} (see log_output) always pass.
+    """
+
+    def __init__(self, messages=RATE_LIMIT_MESSAGES, interval=RATE_LIMIT_INTERVAL):
+        super().__init__()
+        self.messages = messages
+        self.interval = interval
+        self._sites = {}  # (logger, path, line) -> [window start, count, suppressed]
+
+    def filter(self, record):
+        if getattr(record, "badman_user_output", False):
+            return True
+        now = time.monotonic()
+        key = (record.name, record.pathname, record.lineno)
+        site = self._sites.get(key)
+        if site is None or now - site[0] >= self.interval:
+            suppressed = site[2] if site is not None else 0
+            site = self._sites[key] = [now, 0, 0]
+            if suppressed:
+                record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        site[1] += 1
+        if site[1] > self.messages:
+            site[2] += 1
+            return False
+        return True
+
+
+def _console_enabled(record):
+    return getattr(record, "badman_console", True)
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener that also runs records carrying a badman_action on its thread."""
+
+    def handle(self, record):
+        action = getattr(record, "badman_action", None)
+        if action is not None:
+            action()
+        else:
+            super().handle(record)
+
+
+def _on_listener(action):
+    """Run action on the logging thread, after every record queued before it."""
+    record = logging.makeLogRecord({"badman_action": action})
+    _listener.queue.put_nowait(record)
+
+
+def _start_listener():
+    global _listener
+    console = logging.StreamHandler()
+    console.setFormatter(TruncatingFormatter("[%(name)s] %(levelname)s: %(message)s"))
+    console.addFilter(_console_enabled)
+    console.addFilter(RateLimitFilter())
+    _listener = _Listener(queue.SimpleQueue(), console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def _setup():
+    """Configure the pack logger once: queue handler, level from BADMAN_LOG_LEVEL."""
+    logger = logging.getLogger(LOGGER_NAME)
+    with _setup_lock:
+        if _listener is None:
+            _start_listener()
+            logger.addHandler(logging.handlers.QueueHandler(_listener.queue))
+            level = os.environ.get("BADMAN_LOG_LEVEL", "INFO").upper()
+            logger.setLevel(getattr(logging, level, logging.INFO))
+            # ComfyUI's root handlers would print every record a second time
+            logger.propagate = False
+    return logger
+
+
+def get_logger(name=None):
+    """The pack logger, or its child BadmanNodes.<name>."""
+    logger = _setup()
+    return logger.getChild(name) if name else logger
+
+
+def log_output(logger, value, console=True, file=None):
+    """
+    Log value at INFO whatever the logger level, for values printed on request.
+
+    Not rate limited. console=False keeps it off the console, file is a path
+    returned by add_rotating_file.
+    """
+    fn, lno, func, sinfo = logger.findCaller(stacklevel=2)
+    extra = {"badman_console": console, "badman_user_output": True, "badman_file": file}
+    # Logger.handle skips the level check that logger.info would do
+    logger.handle(logger.makeRecord(logger.name, logging.INFO, fn, lno, "%s", (value,), None, func, extra, sinfo))
+
+
+def _swap_file_handler(old, new):
+    # Runs on the logging thread, so records queued for old are written before it closes
+    _listener.handlers = tuple(h for h in _listener.handlers if h is not old) + ((new,) if new is not None else ())
+    if old is not None:
+        old.close()
+
+
+def add_rotating_file(path, max_bytes=10 * 1024 * 1024, backup_count=3):
+    """
+    Write records logged with extra={"badman_file": path} to a rotating file.
+
+    Handlers are created once per path and run on the background thread
+    like the console handler. At most MAX_OPEN_LOG_FILES are kept, the least
+    recently used one is closed (and reopened when it is used again).
+    Returns the absolute path to log with.
+    """
+    _setup()
+    path = os.path.abspath(path)
+    with _setup_lock:
+        handler = _file_handlers.get(path)
+        if handler is None or handler.maxBytes != max_bytes or handler.backupCount != backup_count:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            new_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+            new_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            new_handler.addFilter(lambda record: getattr(record, "badman_file", None) == path)
+            _on_listener(lambda old=handler, new=new_handler: _swap_file_handler(old, new))
+            _file_handlers[path] = new_handler
+        _file_handlers.move_to_end(path)
+        while len(_file_handlers) > MAX_OPEN_LOG_FILES:
+            _, evicted = _file_handlers.popitem(last=False)
+            _on_listener(lambda old=evicted: _swap_file_handler(old, None))
+    return path
@@ -1,3 +1,4 @@
+import operator
 
 
 class BadmanIntUtil:
@@ -39,7 +40,9 @@ class BadmanIntUtil:
         elif mode == "sub":
             return Int1 - Int2
         elif mode == "divide":
-            return Int1/Int1
+            if Int2 == 0:
+                raise ValueError("Cannot divide by zero")
+            return Int1 // Int2
         else:
             raise ValueError(f"Unsupported math mode: {mode}")
 
@@ -108,3 +111,93 @@ class BadmanSelectFromList:
         except IndexError:
             raise IndexError(f"Index {index} is out of bounds for list of length {len(any_list)}")
 
+
+INT_LIST_OPERATIONS = {
+    "add": operator.add,
+    "multiply": operator.mul,
+    "sub": operator.sub,
+    "floordiv": operator.floordiv,
+    "mod": operator.mod,
+    "min": min,
+    "max": max,
+}
+
+
+def _int_list(values):
+    """Flatten an INPUT_IS_LIST input, unwrapping lists that arrive as a single value."""
+    flat = []
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            flat.extend(value)
+        else:
+            flat.append(value)
+    return [int(value) for value in flat]
+
+
+class BadmanIntListMath:
+    """
+    Elementwise integer math over INT lists in a single execution.
+
+    Takes lists either as list outputs or as one list value (like the
+    WanOutpaintFrameCalculator outputs). A list of length 1 is broadcast
+    against the other operand; clamp limits a to [low, high].
+    """
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "a": ("INT", {"default": 0, "min": -0xffffffffffffffff, "max": 0xffffffffffffffff,
+                              "tooltip": "INT or INT list"}),
+                "b": ("INT", {"default": 0, "min": -0xffffffffffffffff, "max": 0xffffffffffffffff,
+                              "tooltip": "INT or INT list, broadcast if it has one element"}),
+                "operation": (list(INT_LIST_OPERATIONS) + ["clamp"],),
+            },
+            "optional": {
+                "low": ("INT", {"default": 0, "min": -0xffffffffffffffff, "max": 0xffffffffffffffff,
+                                "tooltip": "Lower bound for clamp"}),
+                "high": ("INT", {"default": 0, "min": -0xffffffffffffffff, "max": 0xffffffffffffffff,
+                                 "tooltip": "Upper bound for clamp"}),
+            },
+        }
+
+    RETURN_TYPES = ("INT", "INT",)
+    RETURN_NAMES = ("result", "count",)
+    FUNCTION = "process"
+    CATEGORY = "Badman"
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True, False)
+
+    def process(self, a, b, operation, low=None, high=None):
+        a = _int_list(a)
+        operation = operation[0]
+        if not a:
+            raise ValueError("Cannot do math on an empty list")
+
+        if operation == "clamp":
+            low = low[0] if low else 0
+            high = high[0] if high else 0
+            if low > high:
+                raise ValueError(f"Clamp low {low} is greater than high {high}")
+            result = [min(max(value, low), high) for value in a]
+            return (result, len(result),)
+
+        if operation not in INT_LIST_OPERATIONS:
+            raise ValueError(f"Unsupported math mode: {operation}")
+        b = _int_list(b)
+        if len(a) != len(b) and len(a) != 1 and len(b) != 1:
+            raise ValueError(f"Cannot broadcast lists of length {len(a)} and {len(b)}")
+        if operation in ("floordiv", "mod") and 0 in b:
+            raise ValueError("Cannot divide by zero")
+
+        func = INT_LIST_OPERATIONS[operation]
+        if len(b) == 1:
+            result = [func(value, b[0]) for value in a]
+        elif len(a) == 1:
+            result = [func(a[0], value) for value in b]
+        else:
+            result = list(map(func, a, b))
+        return (result, len(result),)
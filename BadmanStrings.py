@@ -1,5 +1,12 @@
 import os
 
+import folder_paths
+
+from .BadmanLogging import add_rotating_file, get_logger, log_output
+
+logger = get_logger("print")
+
+
 class BadmanPrint:
 
     def __init__(self):
@@ -9,6 +16,12 @@ class BadmanPrint:
     def INPUT_TYPES(s):
         return {
             "required": {"value": ("STRING", {"multiline": True,"default": ""})},
+            "optional": {
+                "console": ("BOOLEAN", {"default": True}),
+                "log_file": ("STRING", {"default": "", "tooltip": "Rotating log file, a path relative to the output folder"}),
+                "max_file_mb": ("INT", {"default": 10, "min": 1, "max": 4096}),
+                "backup_count": ("INT", {"default": 3, "min": 0, "max": 100}),
+            },
         }
     
     RETURN_TYPES = ()
@@ -16,9 +29,23 @@ class BadmanPrint:
     FUNCTION = "log_input"
     CATEGORY = "Badman"
 
-    def log_input(self, value):
-        print(value,)
+    def log_input(self, value, console=True, log_file="", max_file_mb=10, backup_count=3):
+        # Written by the logging thread, the node doesn't wait for the console or file
+        log_path = None
+        if log_file.strip():
+            log_path = add_rotating_file(self.output_log_path(log_file.strip()), max_file_mb * 1024 * 1024, backup_count)
+        # Printing is what the node is for, BADMAN_LOG_LEVEL and the rate limit don't apply
+        log_output(logger, value, console=console, file=log_path)
         return {}
+
+    @staticmethod
+    def output_log_path(log_file):
+        """Resolve log_file in the output folder, refusing paths that point outside of it."""
+        output_dir = os.path.realpath(folder_paths.get_output_directory())
+        log_path = os.path.realpath(os.path.join(output_dir, log_file))
+        if os.path.isabs(log_file) or log_path == output_dir or os.path.commonpath((output_dir, log_path)) != output_dir:
+            raise ValueError(f"log_file must be a file path inside the output folder, got {log_file}")
+        return log_path
     
 class ConcatString:
     def __init__(self):
@@ -1,60 +1,122 @@
 import comfy.utils
 import comfy.model_management
 import comfy.clip_vision
-import comfy.context_windows
 import torch
 import nodes
 from node_helpers import conditioning_set_values
 
 
-# Monkey patch to fix context window bug for WAN models with concat_latent_image
-_original_get_resized_cond = comfy.context_windows.IndexListContextHandler.get_resized_cond
+def expand_mask_profile(mask_profile, latent_height, latent_width):
+    """
+    Expand a per-frame mask profile into the concat_mask layout the sampler expects.
 
-def _fixed_get_resized_cond(self, cond_in, x_in, window, device=None):
- 
-    if cond_in is None:
-        return None
-    
-    resized_cond = []
-    for actual_cond in cond_in:
-        resized_actual_cond = actual_cond.copy()
-        for key in actual_cond:
-            try:
-                cond_item = actual_cond[key]
-                if isinstance(cond_item, torch.Tensor):
-                    if self.dim < cond_item.ndim and cond_item.size(self.dim) == x_in.size(self.dim):
-                        actual_cond_item = window.get_tensor(cond_item)
-                        resized_actual_cond[key] = actual_cond_item.to(device)
-                    else:
-                        resized_actual_cond[key] = cond_item.to(device)
-                elif key == "control":
-                    resized_actual_cond[key] = self.prepare_control_objects(cond_item, device)
-                elif isinstance(cond_item, dict):
-                    new_cond_item = cond_item.copy()
-                    for cond_key, cond_value in new_cond_item.items():
-                        if isinstance(cond_value, torch.Tensor):
-                            # FIX: Changed from cond_value.ndim < self.dim to self.dim < cond_value.ndim
-                            # and from size(0) to size(self.dim) to match top-level tensor logic
-                            if self.dim < cond_value.ndim and cond_value.size(self.dim) == x_in.size(self.dim):
-                                new_cond_item[cond_key] = window.get_tensor(cond_value, device)
-                            else:
-                                new_cond_item[cond_key] = cond_value.to(device) if device else cond_value
-                        elif hasattr(cond_value, "cond") and isinstance(cond_value.cond, torch.Tensor):
-                            if self.dim < cond_value.cond.ndim and cond_value.cond.size(self.dim) == x_in.size(self.dim):
-                                new_cond_item[cond_key] = cond_value._copy_with(window.get_tensor(cond_value.cond, device))
-                        elif cond_key == "num_video_frames":
-                            new_cond_item[cond_key] = cond_value._copy_with(cond_value.cond)
-                            new_cond_item[cond_key].cond = window.context_length
-                    resized_actual_cond[key] = new_cond_item
-                else:
-                    resized_actual_cond[key] = cond_item
-            finally:
-                del cond_item
-        resized_cond.append(resized_actual_cond)
-    return resized_cond
-
-# Apply the patch
-comfy.context_windows.IndexListContextHandler.get_resized_cond = _fixed_get_resized_cond
+    The WAN concat mask is constant across H and W, so only the temporal
+    profile is stored. The result is a broadcast view: (T*4,) -> (1, T, 4, 1, 1)
+    -> (1, 4, T, 1, 1) -> (1, 4, T, H, W) without allocating the spatial dims.
+
+    Args:
+        mask_profile: 1D tensor of shape (T*4,) in pixel frame space
+        latent_height, latent_width: Spatial size of the latent
+
+    Returns:
+        Tensor view of shape (1, 4, T, latent_height, latent_width)
+    """
+    return mask_profile.view(1, -1, 4, 1, 1).transpose(1, 2).expand(-1, -1, -1, latent_height, latent_width)
+
+
+def mask_debug_visualization(image, mask_profile, length, frame_stride=1, scale=1.0):
+    """
+    Render the conditioning mask as a white overlay on top of the canvas.
+
+    The overlay is a single in-place lerp towards white, so at full settings
+    the canvas itself is reused and no extra video-sized tensors are created.
+    The canvas must not be needed afterwards. frame_stride and scale decimate
+    the output to keep long, high resolution previews cheap.
+
+    Args:
+        image: Canvas of shape (length, height, width, 3)
+        mask_profile: Per-frame mask of shape (T*4,)
+        length: Number of real frames (padding frames are ignored)
+        frame_stride (int): Only render every Nth frame
+        scale (float): Resolution factor of the output (<= 1.0)
+
+    Returns:
+        IMAGE tensor where mask=0.0 shows the canvas and mask=1.0 is full white
+    """
+    # Only use the first 'length' frames from the mask (ignore padding).
+    # The mask is spatially constant, so a per-frame weight broadcasts over H, W, C
+    mask_viz = mask_profile[:length:frame_stride].view(-1, 1, 1, 1)
+    image = image[::frame_stride]
+
+    if scale < 1.0:
+        out_height = max(1, round(image.shape[1] * scale))
+        out_width = max(1, round(image.shape[2] * scale))
+        image = comfy.utils.common_upscale(
+            image.movedim(-1, 1), out_width, out_height, "bilinear", "disabled"
+        ).movedim(1, -1)
+    elif frame_stride > 1:
+        # Copy the selected frames so the full canvas can be freed
+        image = image.clone()
+
+    # Blend: white overlay based on mask strength
+    # mask=0.0 (no white, show original), mask=1.0 (full white, fully masked)
+    white = torch.ones((), dtype=image.dtype, device=image.device)
+    return image.lerp_(white, mask_viz.to(image.dtype))
+
+
+def parse_frame_positions(frame_positions, num_keyframes, length):
+    """
+    Parse a comma-separated list of keyframe positions into frame indices.
+
+    Values are frame indices; negative values count from the end (-1 is the
+    last frame). An empty string spreads the keyframes evenly over the video.
+
+    Args:
+        frame_positions (str): e.g. "0,40,80" or "0,-1"
+        num_keyframes (int): Number of keyframes in the IMAGE batch
+        length (int): Total video length in frames
+
+    Returns:
+        torch.LongTensor: One clamped frame index per keyframe
+    """
+    if not frame_positions or not frame_positions.strip():
+        return torch.linspace(0, length - 1, num_keyframes).round().long()
+
+    try:
+        positions = [int(x.strip()) for x in frame_positions.split(',') if x.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid frame positions '{frame_positions}', expected comma-separated integers")
+
+    if len(positions) != num_keyframes:
+        raise ValueError(f"Got {len(positions)} frame positions for {num_keyframes} keyframes")
+
+    positions = torch.tensor(positions, dtype=torch.long)
+    positions = torch.where(positions < 0, positions + length, positions)
+    return positions.clamp(0, length - 1)
+
+
+def keyframe_regions(positions, length, frame_blend_width):
+    """
+    Compute the [start, end) frame region each keyframe is held for.
+
+    Follows the placement used by WanThreeFrameToVideo: a keyframe on the
+    first frame covers [0, w), one on the last frame covers [length-w, length)
+    and anything in between covers [p - w//2, p + w//2), clamped to the video.
+    Every region holds at least its own frame, so with w=1 a middle keyframe
+    covers [p, p+1) instead of nothing.
+
+    Returns:
+        tuple: (starts, ends) as LongTensors of shape (N,)
+    """
+    is_first = positions == 0
+    is_last = positions == length - 1
+    starts = torch.where(is_first, 0, positions - frame_blend_width // 2)
+    starts = torch.where(is_last, length - frame_blend_width, starts).clamp(min=0)
+    ends = torch.where(is_first, frame_blend_width, positions + frame_blend_width // 2)
+    ends = torch.where(is_last, length, ends).clamp(max=length)
+    ends = torch.maximum(ends, positions + 1)
+    starts = torch.minimum(starts, positions)
+    return starts, ends
 
 
 class WanThreeFrameToVideo:
@@ -85,6 +147,8 @@ class WanThreeFrameToVideo:
                 "clip_vision_middle_image": ("CLIP_VISION_OUTPUT", ),
                 "clip_vision_end_image": ("CLIP_VISION_OUTPUT", ),
                 "debug_show_mask": ("BOOLEAN", {"default": False, "tooltip": "Output debug visualization showing mask as white overlay"}),
+                "debug_frame_stride": ("INT", {"default": 1, "min": 1, "max": 64, "step": 1, "tooltip": "Only render every Nth frame of the debug visualization"}),
+                "debug_scale": ("FLOAT", {"default": 1.0, "min": 0.05, "max": 1.0, "step": 0.05, "tooltip": "Resolution factor of the debug visualization"}),
             }
         }
 
@@ -97,7 +161,8 @@ class WanThreeFrameToVideo:
                 middle_frame_position, frame_blend_width,
                 start_image=None, middle_image=None, end_image=None, 
                 clip_vision_start_image=None, clip_vision_middle_image=None, 
-                clip_vision_end_image=None, debug_show_mask=False):
+                clip_vision_end_image=None, debug_show_mask=False,
+                debug_frame_stride=1, debug_scale=1.0):
         
         spacial_scale = vae.spacial_compression_encode()
         latent = torch.zeros(
@@ -112,7 +177,8 @@ class WanThreeFrameToVideo:
         # This may be slightly longer than actual length for padding
         latent_frames = latent.shape[2]
         mask_temporal_dim = latent_frames * 4
-        mask = torch.ones((1, 1, mask_temporal_dim, latent.shape[-2], latent.shape[-1]))
+        # Only the per-frame profile is stored, the spatial dims are a broadcast view
+        mask = torch.ones(mask_temporal_dim)
         
         # Upscale images to target resolution
         if start_image is not None:
@@ -148,7 +214,7 @@ class WanThreeFrameToVideo:
             
             # Binary mask: 0.0 for keyframe region (use provided image)
             # Context window fusion will handle smooth blending at overlaps
-            mask[:, :, :blend_region_end + 3] = 0.0
+            mask[:blend_region_end + 3] = 0.0
         
         # Middle frame
         if middle_image is not None:
@@ -167,7 +233,7 @@ class WanThreeFrameToVideo:
             
             # Binary mask: 0.0 for middle keyframe region (use provided image)
             # Context window fusion will handle smooth blending at overlaps
-            mask[:, :, middle_start:min(middle_end + 3, mask_temporal_dim)] = 0.0
+            mask[middle_start:min(middle_end + 3, mask_temporal_dim)] = 0.0
         
         # End frame at end
         if end_image is not None:
@@ -185,17 +251,17 @@ class WanThreeFrameToVideo:
             
             # Binary mask: 0.0 for end keyframe region (use provided image)
             # Context window fusion will handle smooth blending at overlaps
-            mask[:, :, end_start:min(length, mask_temporal_dim)] = 0.0
+            mask[end_start:min(length, mask_temporal_dim)] = 0.0
         
         # Encode image to latent space
         concat_latent_image = vae.encode(image[:, :, :, :3])
         
-        # Save mask before reshape for debug visualization
-        mask_before_reshape = mask.clone()
+        # Keep the 1D profile for debug visualization, it is tiny so no clone is needed
+        mask_profile = mask
         
-        # Reshape mask to match latent dimensions with proper 4D structure for temporal processing
-        # mask goes from (1, 1, T*4, H, W) -> (1, T, 4, H, W) -> (1, 4, T, H, W)
-        mask = mask.view(1, mask.shape[2] // 4, 4, mask.shape[3], mask.shape[4]).transpose(1, 2)
+        # Expand to latent dimensions with proper 4D structure for temporal processing
+        # mask goes from (T*4,) -> (1, 4, T, H, W) as a broadcast view
+        mask = expand_mask_profile(mask_profile, latent.shape[-2], latent.shape[-1])
         
         # Apply to conditioning
         # Note: When using context windows, these will be automatically subset by the context handler
@@ -245,26 +311,8 @@ class WanThreeFrameToVideo:
             )
         
         # Create debug visualization if requested
-        debug_image = None
         if debug_show_mask:
-            # Only use the first 'length' frames from the mask (ignore padding)
-            mask_for_viz = mask_before_reshape[:, :, :length, :, :]
-            
-            # Upsample mask from latent resolution to image resolution
-            # mask_for_viz shape: (1, 1, length, latent_h, latent_w)
-            mask_upsampled = torch.nn.functional.interpolate(
-                mask_for_viz.squeeze(1),  # (1, length, latent_h, latent_w)
-                size=(height, width),
-                mode='nearest'
-            )  # (1, length, height, width)
-            
-            # Rearrange to (length, height, width, 1) and expand to RGB
-            mask_viz = mask_upsampled.permute(1, 2, 3, 0).expand(-1, -1, -1, 3)  # (length, height, width, 3)
-            
-            # Blend: white overlay based on mask strength
-            # mask=0.0 (no white, show original), mask=1.0 (full white, fully masked)
-            white = torch.ones_like(image)
-            debug_image = image * (1 - mask_viz) + white * mask_viz
+            debug_image = mask_debug_visualization(image, mask_profile, length, debug_frame_stride, debug_scale)
         else:
             # Return empty image if debug not enabled
             debug_image = torch.zeros((1, 64, 64, 3))
@@ -272,4 +320,118 @@ class WanThreeFrameToVideo:
         # Return latent
         out_latent = {}
         out_latent["samples"] = latent
-        return (positive, negative, out_latent, debug_image)
\ No newline at end of file
+        return (positive, negative, out_latent, debug_image)
+
+
+class WanKeyframesToVideo:
+    """
+    Generalization of WanThreeFrameToVideo to N keyframes at arbitrary positions.
+
+    Keyframes come in as a single IMAGE batch together with a list of frame
+    positions. The canvas, the latent-stride aligned mask and the concatenated
+    CLIP vision states are each built in one vectorized pass, so the cost does
+    not grow with per-keyframe Python work.
+    """
+
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "positive": ("CONDITIONING", ),
+                "negative": ("CONDITIONING", ),
+                "vae": ("VAE", ),
+                "keyframes": ("IMAGE", {"tooltip": "Batch of keyframe images, one per position"}),
+                "frame_positions": ("STRING", {"default": "", "multiline": False, "tooltip": "Comma-separated frame index per keyframe (e.g. '0,40,80'). Negative values count from the end. Empty spreads keyframes evenly."}),
+                "width": ("INT", {"default": 832, "min": 16, "max": nodes.MAX_RESOLUTION, "step": 16}),
+                "height": ("INT", {"default": 480, "min": 16, "max": nodes.MAX_RESOLUTION, "step": 16}),
+                "length": ("INT", {"default": 81, "min": 1, "max": nodes.MAX_RESOLUTION, "step": 4, "tooltip": "Total video length in frames"}),
+                "batch_size": ("INT", {"default": 1, "min": 1, "max": 4096}),
+                "frame_blend_width": ("INT", {"default": 8, "min": 1, "max": 32, "step": 1, "tooltip": "Number of frames each keyframe is held for around its position"}),
+            },
+            "optional": {
+                "clip_vision_output": ("CLIP_VISION_OUTPUT", {"tooltip": "CLIP vision encoding of the keyframe batch; per-keyframe states are concatenated in order"}),
+                "debug_show_mask": ("BOOLEAN", {"default": False, "tooltip": "Output debug visualization showing mask as white overlay"}),
+                "debug_frame_stride": ("INT", {"default": 1, "min": 1, "max": 64, "step": 1, "tooltip": "Only render every Nth frame of the debug visualization"}),
+                "debug_scale": ("FLOAT", {"default": 1.0, "min": 0.05, "max": 1.0, "step": 0.05, "tooltip": "Resolution factor of the debug visualization"}),
+            }
+        }
+
+    RETURN_TYPES = ("CONDITIONING", "CONDITIONING", "LATENT", "IMAGE")
+    RETURN_NAMES = ("positive", "negative", "latent", "debug_mask_visualization")
+    FUNCTION = "execute"
+    CATEGORY = "conditioning/video_models"
+
+    def execute(self, positive, negative, vae, keyframes, frame_positions, width, height, length,
+                batch_size, frame_blend_width, clip_vision_output=None, debug_show_mask=False,
+                debug_frame_stride=1, debug_scale=1.0):
+
+        spacial_scale = vae.spacial_compression_encode()
+        latent = torch.zeros(
+            [batch_size, vae.latent_channels, ((length - 1) // 4) + 1,
+             height // spacial_scale, width // spacial_scale],
+            device=comfy.model_management.intermediate_device()
+        )
+        latent_frames = latent.shape[2]
+        mask_temporal_dim = latent_frames * 4
+
+        num_keyframes = keyframes.shape[0]
+        positions = parse_frame_positions(frame_positions, num_keyframes, length)
+        starts, ends = keyframe_regions(positions, length, frame_blend_width)
+
+        # Upscale all keyframes in a single call
+        keyframes = comfy.utils.common_upscale(
+            keyframes.movedim(-1, 1), width, height, "bilinear", "center"
+        ).movedim(1, -1)
+
+        # Which keyframe owns each frame: later keyframes win on overlap, like
+        # end > middle > start in WanThreeFrameToVideo. 0 means no keyframe.
+        frame_idx = torch.arange(length)
+        covered = (frame_idx >= starts[:, None]) & (frame_idx < ends[:, None])  # (N, length)
+        keyframe_ids = torch.arange(1, num_keyframes + 1)[:, None]
+        owner = (covered.long() * keyframe_ids).amax(dim=0)
+        held_frames = owner.nonzero().squeeze(1)
+
+        image = torch.ones((length, height, width, 3)) * 0.5
+        image[held_frames] = keyframes[owner[held_frames] - 1, :, :, :3]
+
+        # Mask regions extend 3 frames past the keyframe region so the zeroed
+        # area covers whole latent frames, except for the last-frame keyframe.
+        # A keyframe that is both first and last (length 1) follows the start rule.
+        is_end = (positions == length - 1) & (positions != 0)
+        mask_ends = torch.where(is_end, ends, ends + 3).clamp(max=mask_temporal_dim)
+        mask_idx = torch.arange(mask_temporal_dim)
+        mask_zero = ((mask_idx >= starts[:, None]) & (mask_idx < mask_ends[:, None])).any(dim=0)
+        mask_profile = torch.ones(mask_temporal_dim)
+        mask_profile[mask_zero] = 0.0
+
+        concat_latent_image = vae.encode(image[:, :, :, :3])
+
+        mask = expand_mask_profile(mask_profile, latent.shape[-2], latent.shape[-1])
+
+        positive = conditioning_set_values(
+            positive, {"concat_latent_image": concat_latent_image, "concat_mask": mask}
+        )
+        negative = conditioning_set_values(
+            negative, {"concat_latent_image": concat_latent_image, "concat_mask": mask}
+        )
+
+        if clip_vision_output is not None:
+            # (N, tokens, dim) -> (1, N * tokens, dim), the same layout as
+            # concatenating every keyframe's states along dim=-2
+            states = clip_vision_output.penultimate_hidden_states
+            if states.shape[0] != num_keyframes:
+                raise ValueError(f"clip_vision_output has {states.shape[0]} images but there are {num_keyframes} keyframes, "
+                                 "encode the same keyframe batch with CLIP Vision")
+            merged = comfy.clip_vision.Output()
+            merged.penultimate_hidden_states = states.reshape(1, -1, states.shape[-1])
+            positive = conditioning_set_values(positive, {"clip_vision_output": merged})
+            negative = conditioning_set_values(negative, {"clip_vision_output": merged})
+
+        if debug_show_mask:
+            debug_image = mask_debug_visualization(image, mask_profile, length, debug_frame_stride, debug_scale)
+        else:
+            debug_image = torch.zeros((1, 64, 64, 3))
+
+        out_latent = {}
+        out_latent["samples"] = latent
+        return (positive, negative, out_latent, debug_image)
@@ -3,6 +3,10 @@ BadmanWanOutpaintNodes.py
 Custom nodes for calculating frame parameters for Wan 2.2 outpainting workflows.
 """
 
+import json
+
+import torch
+
 
 def is_valid_wan_frame_count(n):
     """
@@ -53,6 +57,353 @@ def find_min_valid_context(min_context=9):
     return next_valid_wan_frame_count(min_context)
 
 
+def largest_valid_wan_frame_count(n):
+    """
+    Round down to the largest valid WAN frame count that is <= n.
+
+    Args:
+        n (int): Upper bound
+
+    Returns:
+        int: Largest valid frame count (<= n), at least 1
+    """
+    if n < 1:
+        return 1
+    return 1 + 4 * ((n - 1) // 4)
+
+
+def parse_additional_context(additional_context_per_sampler):
+    """
+    Parse the comma-separated additional context string of the calculator.
+
+    Args:
+        additional_context_per_sampler (str): e.g. "0,0,4"
+
+    Returns:
+        list: Extra context frames per sampler, empty if parsing fails
+    """
+    if not additional_context_per_sampler or not additional_context_per_sampler.strip():
+        return []
+    try:
+        return [int(x.strip()) for x in additional_context_per_sampler.split(',') if x.strip()]
+    except ValueError:
+        # If parsing fails, default to no additional context
+        return []
+
+
+def stage_context(sampler_index, min_context=9, additional_context=None):
+    """
+    Context frames for a sampler that is not the last one.
+
+    The first sampler has no context. Later samplers use the minimum valid
+    context (>= min_context) plus their additional context, rounded up to a
+    valid frame count.
+    """
+    if sampler_index == 0:
+        return 0
+    additional_context = additional_context or []
+    extra_context = additional_context[sampler_index] if sampler_index < len(additional_context) else 0
+    extra_context = max(0, extra_context)  # Ensure non-negative
+    return next_valid_wan_frame_count(find_min_valid_context(min_context) + extra_context)
+
+
+def greedy_outpaint_schedule(total_frames, max_generation_length=81, min_context=9, additional_context=None):
+    """
+    Emit full-length chunks with minimum context until the video is covered.
+
+    This is the original WanOutpaintFrameCalculator behaviour; the last
+    stage takes whatever is left, which can make it very short.
+
+    Returns:
+        tuple: (generation_lengths, context_frames, start_positions)
+    """
+    max_length = largest_valid_wan_frame_count(max_generation_length)
+
+    # If the video fits in one sampler, adjust to a valid frame count to avoid loss
+    if total_frames <= max_length:
+        return [next_valid_wan_frame_count(total_frames)], [0], [0]
+
+    # First sampler always generates a full chunk with no context
+    generation_lengths = [max_length]
+    context_frames = [0]
+    start_positions = [0]
+
+    # Track how many frames we've covered (after first generation)
+    frames_covered = max_length
+
+    sampler_index = 1  # Start at 1 since sampler 0 is already done
+    while frames_covered < total_frames:
+        remaining_frames = total_frames - frames_covered
+        min_ctx = stage_context(sampler_index, min_context, additional_context)
+        if min_ctx >= max_length:
+            raise ValueError(f"Context of {min_ctx} frames leaves no room for new frames in a {max_length} frame chunk")
+
+        if remaining_frames <= max_length - min_ctx:
+            # This is the last sampler, the result must be a valid WAN frame count
+            # and the context is whatever makes the math work out
+            gen_length = next_valid_wan_frame_count(remaining_frames + min_ctx)
+            ctx_frames = gen_length - remaining_frames
+        else:
+            # Not the last sampler - generate a full chunk with minimum context
+            gen_length = max_length
+            ctx_frames = min_ctx
+
+        generation_lengths.append(gen_length)
+        context_frames.append(ctx_frames)
+        start_positions.append(frames_covered)
+
+        # Update frames covered (subtract context since those frames overlap)
+        frames_covered += (gen_length - ctx_frames)
+        sampler_index += 1
+
+    return generation_lengths, context_frames, start_positions
+
+
+OUTPAINT_OBJECTIVES = ["min_generated_frames", "min_stages", "min_compute"]
+
+# Transformer shapes used by the cost model (hidden dim, ffn dim, layers)
+WAN_MODEL_PRESETS = {
+    "14B": {"dim": 5120, "ffn_dim": 13824, "layers": 40},
+    "1.3B": {"dim": 1536, "ffn_dim": 8960, "layers": 30},
+}
+
+# WAN 2.1/2.2 VAE: 8x spatial, 4x temporal compression, 16 latent channels.
+# The transformer patchifies latents by 2x2.
+_LATENT_CHANNELS = 16
+_CONCAT_CHANNELS = 20  # 4 mask channels + 16 channels of concat latent
+_TEXT_TOKENS = 512
+
+# Rough heuristics, calibrated to land in the right ballpark for 480p/720p
+# runs. They are meant for comparing plans, not for exact VRAM accounting.
+_VAE_ENCODE_BYTES_PER_PIXEL = 768   # per-frame encoder workspace
+_VAE_DECODE_BYTES_PER_PIXEL = 1280  # per-frame decoder workspace
+_VAE_FLOPS_PER_PIXEL = 2.5e6        # encode + decode
+_ACTIVATION_TENSORS = 6             # live hidden-size tensors in a block
+
+
+def latent_frame_count(frames):
+    """Latent frames for a valid WAN frame count (1 + (frames - 1) / 4)."""
+    return (frames - 1) / 4 + 1
+
+
+def stage_compute(width, height, frames, model_size="14B", steps=20, cfg_batch=2):
+    """
+    Approximate FLOPs to sample and VAE encode/decode one stage.
+
+    Per block and token: q/k/v/o of self attention and q/o of cross
+    attention (12 d^2), the FFN (4 d ffn_dim), self attention scores
+    (4 N d) and cross attention against the text tokens (4 * 512 * d).
+    Works with float frame counts so it can be used as a convex bound.
+    """
+    preset = WAN_MODEL_PRESETS[model_size]
+    dim, ffn_dim, layers = preset["dim"], preset["ffn_dim"], preset["layers"]
+    tokens = latent_frame_count(frames) * (height // 16) * (width // 16)
+    per_block = tokens * (12 * dim * dim + 4 * dim * ffn_dim + 4 * tokens * dim + 4 * _TEXT_TOKENS * dim)
+    sampler = per_block * layers * steps * cfg_batch
+    vae = frames * width * height * _VAE_FLOPS_PER_PIXEL
+    return sampler + vae
+
+
+def estimate_stage_cost(width, height, frames, context_frames=0, model_size="14B", steps=20, cfg_batch=2):
+    """
+    Estimate memory and relative compute of one outpaint stage.
+
+    Args:
+        width, height (int): Output resolution in pixels
+        frames (int): Frames generated by the stage (valid WAN count)
+        context_frames (int): Frames of the stage that overlap the previous one
+        model_size (str): Key of WAN_MODEL_PRESETS
+        steps (int): Sampler steps
+        cfg_batch (int): 2 when cond and uncond are batched, 1 otherwise
+
+    Returns:
+        dict: Byte counts for latents, VAE encode/decode and sampler
+        activations, their peak, and compute relative to an 81 frame stage
+        at the same settings. Model weights are not included.
+    """
+    preset = WAN_MODEL_PRESETS[model_size]
+    latent_frames = (frames - 1) // 4 + 1
+    latent_pixels = latent_frames * (height // 8) * (width // 8)
+    tokens = latent_frames * (height // 16) * (width // 16)
+
+    latent_bytes = _LATENT_CHANNELS * latent_pixels * 4
+    conditioning_bytes = _CONCAT_CHANNELS * latent_pixels * 4
+    pixel_bytes = frames * height * width * 3 * 4
+    vae_encode_bytes = pixel_bytes + height * width * _VAE_ENCODE_BYTES_PER_PIXEL
+    vae_decode_bytes = pixel_bytes + height * width * _VAE_DECODE_BYTES_PER_PIXEL
+    sampler_bytes = cfg_batch * tokens * 2 * (_ACTIVATION_TENSORS * preset["dim"] + preset["ffn_dim"])
+    sampler_bytes += latent_bytes + conditioning_bytes
+
+    compute = stage_compute(width, height, frames, model_size, steps, cfg_batch)
+    reference = stage_compute(width, height, 81, model_size, steps, cfg_batch)
+    return {
+        "frames": frames,
+        "new_frames": frames - context_frames,
+        "latent_bytes": latent_bytes,
+        "conditioning_bytes": conditioning_bytes,
+        "vae_encode_bytes": vae_encode_bytes,
+        "vae_decode_bytes": vae_decode_bytes,
+        "sampler_bytes": sampler_bytes,
+        "peak_bytes": max(sampler_bytes, vae_encode_bytes, vae_decode_bytes),
+        "relative_cost": compute / reference,
+    }
+
+
+def max_length_for_budget(width, height, memory_budget_bytes, max_generation_length=81,
+                          model_size="14B", cfg_batch=2):
+    """
+    Longest valid chunk <= max_generation_length whose estimated peak fits the budget.
+
+    Returns:
+        int or None: Frame count, or None if not even a single frame fits
+    """
+    length = largest_valid_wan_frame_count(max_generation_length)
+    while length >= 1:
+        cost = estimate_stage_cost(width, height, length, model_size=model_size, cfg_batch=cfg_batch)
+        if cost["peak_bytes"] <= memory_budget_bytes:
+            return length
+        length -= 4
+    return None
+
+
+def solve_outpaint_schedule(total_frames, max_generation_length=81, min_context=9,
+                            additional_context=None, objective="min_generated_frames",
+                            stage_compute_fn=None):
+    """
+    Plan outpaint stages that respect the WAN 4k+1 frame constraint.
+
+    Every stage generates a valid frame count <= max_generation_length.
+    Stages after the first overlap the previous output by their context
+    frames (minimum valid context >= min_context plus any additional context);
+    only the last stage may use a larger context to absorb the remainder.
+    Chunk lengths are chosen by dynamic programming over frames covered
+    instead of greedily emitting full-length chunks.
+
+    Objectives:
+        min_generated_frames: fewest total generated frames (sampler cost),
+            then fewest stages, then the most even chunk lengths
+        min_stages: fewest stages, then fewest generated frames, then the
+            most even chunk lengths
+        min_compute: lowest summed stage_compute_fn(length), e.g.
+            stage_compute at the target resolution (defaults to 832x480 on
+            the 14B model). Attention makes cost superlinear in length, so
+            this may pick more, shorter stages.
+
+    Returns:
+        tuple: (generation_lengths, context_frames, start_positions)
+    """
+    if objective not in OUTPAINT_OBJECTIVES:
+        raise ValueError(f"Unsupported outpaint objective: {objective}")
+
+    max_length = largest_valid_wan_frame_count(max_generation_length)
+    if total_frames <= max_length:
+        return [next_valid_wan_frame_count(total_frames)], [0], [0]
+
+    lengths = list(range(1, max_length + 1, 4))
+
+    # Every objective is a per-stage tuple summed over stages and compared
+    # lexicographically, so the stage count is just another cost component
+    if objective == "min_compute":
+        if stage_compute_fn is None:
+            stage_compute_fn = lambda length: stage_compute(832, 480, length)
+        costs = {length: (stage_compute_fn(length), 1, length) for length in lengths}
+    elif objective == "min_stages":
+        costs = {length: (1, length, length * length) for length in lengths}
+    else:
+        costs = {length: (length, 1, length * length) for length in lengths}
+
+    # Context only depends on the stage index within additional_context;
+    # from stage `steady` on it is constant, so those stages share one layer
+    additional_context = additional_context or []
+    contexts = [stage_context(i, min_context, additional_context)
+                for i in range(max(1, len(additional_context)) + 1)]
+    steady = len(contexts) - 1
+    while steady > 1 and contexts[steady - 1] == contexts[steady]:
+        steady -= 1
+
+    # layers[done][covered] = (cost, back pointer) after `done` stages
+    # (capped at steady). Every transition increases frames covered, so one
+    # ascending sweep per layer visits each state after all of its inputs.
+    layers = [[None] * total_frames for _ in range(steady + 1)]
+    for length in lengths:
+        if length < total_frames:
+            layers[1][length] = (costs[length], (None, length, 0, 0))
+
+    best = None
+    for done in range(1, steady + 1):
+        layer = layers[done]
+        next_layer = layers[min(done + 1, steady)]
+        context = contexts[done]
+        for covered in range(1, total_frames):
+            state = layer[covered]
+            if state is None:
+                continue
+            total_cost, back = state
+            remaining = total_frames - covered
+
+            # Finish here, padding the context to reach a valid length
+            length = next_valid_wan_frame_count(remaining + context)
+            if length <= max_length:
+                cost = tuple(a + b for a, b in zip(total_cost, costs[length]))
+                if best is None or cost < best[0]:
+                    best = (cost, (back, length, length - remaining, covered))
+
+            # Or add an intermediate stage with exactly the minimum context
+            for length in lengths:
+                new_covered = covered + length - context
+                if new_covered <= covered:
+                    continue
+                if new_covered >= total_frames:
+                    break
+                cost = tuple(a + b for a, b in zip(total_cost, costs[length]))
+                current = next_layer[new_covered]
+                if current is None or cost < current[0]:
+                    next_layer[new_covered] = (cost, (back, length, context, covered))
+
+    if best is None:
+        return greedy_outpaint_schedule(total_frames, max_generation_length, min_context, additional_context)
+
+    generation_lengths, context_frames, start_positions = [], [], []
+    back = best[1]
+    while back is not None:
+        back, length, ctx_frames, start = back
+        generation_lengths.append(length)
+        context_frames.append(ctx_frames)
+        start_positions.append(start)
+    generation_lengths.reverse()
+    context_frames.reverse()
+    start_positions.reverse()
+    return generation_lengths, context_frames, start_positions
+
+
+def outpaint_plan_summary(total_frames, generation_lengths, context_frames, start_positions, **settings):
+    """
+    Summarize a stage plan for the plan_json output.
+
+    Args:
+        total_frames (int): Frame count of the input video
+        generation_lengths, context_frames, start_positions (list): The plan
+        **settings: Solver settings recorded alongside the plan
+
+    Returns:
+        dict: Plan lists plus total generated frames and overhead
+    """
+    total_generated = sum(generation_lengths)
+    overhead = total_generated - total_frames
+    summary = dict(settings)
+    summary.update({
+        "total_frames": total_frames,
+        "num_stages": len(generation_lengths),
+        "generation_lengths": list(generation_lengths),
+        "context_frames": list(context_frames),
+        "start_positions": list(start_positions),
+        "total_generated_frames": total_generated,
+        "overhead_frames": overhead,
+        "overhead_percent": round(100.0 * overhead / total_frames, 2) if total_frames else 0.0,
+    })
+    return summary
+
+
 class WanOutpaintFrameCalculator:
     """
     Calculates frame parameters for multi-stage Wan 2.2 outpainting.
@@ -85,103 +436,229 @@ class WanOutpaintFrameCalculator:
                     "multiline": False,
                     "tooltip": "Comma-separated list of additional context frames per sampler (e.g., '0,0,4' adds 4 extra context frames to the 3rd sampler). Values shorter than samplers count will be padded with 0."
                 }),
+                "max_generation_length": ("INT", {
+                    "default": 81,
+                    "min": 5,
+                    "max": 1001,
+                    "step": 4,
+                    "tooltip": "Longest chunk a single sampler may generate (rounded down to 4k+1)"
+                }),
+                "min_context": ("INT", {
+                    "default": 9,
+                    "min": 1,
+                    "max": 1000,
+                    "step": 1,
+                    "tooltip": "Minimum context frames for every sampler after the first (rounded up to 4k+1)"
+                }),
+                "mode": (["greedy"] + OUTPAINT_OBJECTIVES, {
+                    "default": "greedy",
+                    "tooltip": "greedy: full-length chunks until the video is covered. min_generated_frames / min_stages: balanced chunks from the schedule solver. min_compute: chunk lengths that minimize the estimated sampler + VAE compute"
+                }),
+                "width": ("INT", {
+                    "default": 832,
+                    "min": 16,
+                    "max": 8192,
+                    "step": 16,
+                    "tooltip": "Output width, used by the cost model"
+                }),
+                "height": ("INT", {
+                    "default": 480,
+                    "min": 16,
+                    "max": 8192,
+                    "step": 16,
+                    "tooltip": "Output height, used by the cost model"
+                }),
+                "model_size": (list(WAN_MODEL_PRESETS.keys()), {
+                    "default": "14B",
+                    "tooltip": "Transformer shape used by the cost model"
+                }),
+                "steps": ("INT", {
+                    "default": 20,
+                    "min": 1,
+                    "max": 1000,
+                    "tooltip": "Sampler steps, used by the cost model"
+                }),
+                "memory_budget_gb": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1024.0,
+                    "step": 0.5,
+                    "tooltip": "VRAM available for latents, activations and VAE work (excluding model weights). Caps the chunk length so every stage fits. 0 disables the cap"
+                }),
             }
         }
     
-    RETURN_TYPES = ("INT", "INT", "INT", "INT")
-    RETURN_NAMES = ("num_samplers", "generation_lengths", "context_frames", "start_positions")
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "STRING")
+    RETURN_NAMES = ("num_samplers", "generation_lengths", "context_frames", "start_positions", "plan_json")
     FUNCTION = "calculate"
     CATEGORY = "video/wan"
     
-    def calculate(self, total_frames, additional_context_per_sampler="0,0,0"):
+    def calculate(self, total_frames, additional_context_per_sampler="0,0,0",
+                  max_generation_length=81, min_context=9, mode="greedy",
+                  width=832, height=480, model_size="14B", steps=20, memory_budget_gb=0.0):
         """
         Calculate frame parameters for Wan outpainting.
         
         Args:
             total_frames (int): Total frame count of input video
             additional_context_per_sampler (str): Comma-separated additional context values
+            max_generation_length (int): Longest chunk a single sampler may generate
+            min_context (int): Minimum context frames for samplers after the first
+            mode (str): "greedy" or one of OUTPAINT_OBJECTIVES for the schedule solver
+            width, height, model_size, steps: Cost model settings
+            memory_budget_gb (float): Per-stage memory budget, 0 for no limit
         
         Returns:
-            tuple: (num_samplers, generation_lengths, context_frames, start_positions)
+            tuple: (num_samplers, generation_lengths, context_frames, start_positions, plan_json)
         """
-        # Parse additional context input
-        additional_context = []
-        if additional_context_per_sampler and additional_context_per_sampler.strip():
-            try:
-                additional_context = [int(x.strip()) for x in additional_context_per_sampler.split(',') if x.strip()]
-            except ValueError:
-                # If parsing fails, default to no additional context
-                additional_context = []
-        
-        # The input total_frames can be any value - we'll break it down into valid chunks
-        # Only adjust if it would cause frame loss in a single-sampler scenario
-        
-        # If video is 81 frames or less, only need 1 sampler
-        # In this case, adjust to valid frame count to avoid loss
-        if total_frames <= 81:
-            adjusted_frames = next_valid_wan_frame_count(total_frames)
-            return (1, [adjusted_frames], [0], [0])
-        
-        # Initialize lists for multi-sampler case
-        generation_lengths = []
-        context_frames = []
-        start_positions = []
-        
-        # First sampler always generates 81 frames with no context
-        generation_lengths.append(81)
-        context_frames.append(0)
-        start_positions.append(0)
-        
-        # Track how many frames we've covered (after first generation)
-        frames_covered = 81
-        
-        # Calculate remaining samplers
-        sampler_index = 1  # Start at 1 since sampler 0 is already done
-        while frames_covered < total_frames:
-            remaining_frames = total_frames - frames_covered
-            
-            # Get additional context for this sampler (0 if not specified)
-            extra_context = additional_context[sampler_index] if sampler_index < len(additional_context) else 0
-            extra_context = max(0, extra_context)  # Ensure non-negative
-            
-            # Determine context frames (minimum valid >= 9) + additional context
-            base_min_context = find_min_valid_context(9)
-            desired_context = base_min_context + extra_context
-            # Ensure the desired context is also a valid frame count
-            min_context = next_valid_wan_frame_count(desired_context)
-            
-            # Determine generation length for this sampler
-            if remaining_frames <= 81 - min_context:
-                # This is the last sampler
-                # We need to generate: remaining_frames + context_frames
-                # And the result must be a valid WAN frame count
-                gen_length = next_valid_wan_frame_count(remaining_frames + min_context)
-                # Context is whatever makes the math work out
-                ctx_frames = gen_length - remaining_frames
-            else:
-                # Not the last sampler - generate 81 frames with minimum context
-                gen_length = 81
-                ctx_frames = min_context
-            
-            generation_lengths.append(gen_length)
-            context_frames.append(ctx_frames)
-            start_positions.append(frames_covered)
-            
-            # Update frames covered (subtract context since those frames overlap)
-            frames_covered += (gen_length - ctx_frames)
-            sampler_index += 1
-        
+        additional_context = parse_additional_context(additional_context_per_sampler)
+
+        if memory_budget_gb > 0:
+            budget_length = max_length_for_budget(
+                width, height, int(memory_budget_gb * 1024 ** 3), max_generation_length, model_size)
+            if budget_length is None:
+                raise ValueError(f"No chunk length fits {memory_budget_gb} GB at {width}x{height}")
+            max_generation_length = min(max_generation_length, budget_length)
+
+        if mode == "greedy":
+            generation_lengths, context_frames, start_positions = greedy_outpaint_schedule(
+                total_frames, max_generation_length, min_context, additional_context)
+        else:
+            generation_lengths, context_frames, start_positions = solve_outpaint_schedule(
+                total_frames, max_generation_length, min_context, additional_context, mode,
+                stage_compute_fn=lambda length: stage_compute(width, height, length, model_size, steps))
+
         num_samplers = len(generation_lengths)
+        summary = outpaint_plan_summary(
+            total_frames, generation_lengths, context_frames, start_positions,
+            mode=mode, max_generation_length=largest_valid_wan_frame_count(max_generation_length),
+            min_context=min_context, width=width, height=height, model_size=model_size,
+            steps=steps, memory_budget_gb=memory_budget_gb,
+        )
+        stages = [estimate_stage_cost(width, height, length, ctx, model_size, steps)
+                  for length, ctx in zip(generation_lengths, context_frames)]
+        summary["stages"] = stages
+        summary["estimated_relative_cost"] = round(sum(stage["relative_cost"] for stage in stages), 4)
+        summary["estimated_peak_gb"] = round(max(stage["peak_bytes"] for stage in stages) / 1024 ** 3, 3)
         
-        return (num_samplers, generation_lengths, context_frames, start_positions)
+        return (num_samplers, generation_lengths, context_frames, start_positions, json.dumps(summary))
+
+
+def plan_stage_ranges(plan, num_frames):
+    """
+    Source frame range of every stage in an outpaint plan.
+
+    Stage i covers [start - context, start - context + length). Ranges that
+    run past the end of the video (single stage rounding, or a video shorter
+    than the plan) report how many frames have to be padded.
+
+    Args:
+        plan (dict): Parsed plan_json of WanOutpaintFrameCalculator
+        num_frames (int): Frames in the source video
+
+    Returns:
+        list: (begin, end, pad) per stage, with end <= num_frames
+    """
+    ranges = []
+    for length, ctx_frames, start in zip(plan["generation_lengths"], plan["context_frames"], plan["start_positions"]):
+        begin = max(0, start - ctx_frames)
+        end = begin + length
+        if begin >= num_frames:
+            raise ValueError(f"Stage starting at frame {begin} is outside the {num_frames} frame video")
+        ranges.append((begin, min(end, num_frames), max(0, end - num_frames)))
+    return ranges
+
+
+def stage_dependencies(context_frames, context_from="previous_generation"):
+    """
+    Mark stages that can run without waiting for another stage.
+
+    With context from the previous generation, every stage with context
+    needs the output of the stage before it. With context from the source
+    video, no stage depends on another.
+
+    Returns:
+        tuple: (independent flags, wave index per stage). Stages in the same
+        wave can be batched together or dispatched to separate workers.
+    """
+    independent, waves = [], []
+    for i, ctx_frames in enumerate(context_frames):
+        depends = context_from == "previous_generation" and i > 0 and ctx_frames > 0
+        independent.append(not depends)
+        waves.append(waves[-1] + 1 if depends else 0)
+    return independent, waves
+
+
+def slice_frames(frames, begin, end, pad):
+    """
+    Frames [begin, end) of a batch, padded by repeating the last frame.
+
+    Returns a view into frames unless padding is needed. A single frame
+    batch is broadcast (also as a view) to the requested length.
+    """
+    if frames.shape[0] == 1:
+        return frames.expand(end - begin + pad, *frames.shape[1:])
+    chunk = frames[begin:end]
+    if pad > 0:
+        chunk = torch.cat((chunk, chunk[-1:].expand(pad, *chunk.shape[1:])), dim=0)
+    return chunk
+
+
+class WanOutpaintStageSlicer:
+    """
+    Slices the source video (and mask) for every stage of an outpaint plan.
+
+    Consumes plan_json from WanOutpaintFrameCalculator and returns one entry
+    per stage. Slices are views into the inputs, so slicing costs no copies
+    (only a stage that needs padding is copied). Stages flagged independent
+    share wave 0 and can be batched or run in parallel.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "video": ("IMAGE",),
+                "plan_json": ("STRING", {"forceInput": True}),
+                "context_from": (["previous_generation", "source"], {
+                    "default": "previous_generation",
+                    "tooltip": "previous_generation: each stage's context frames come from the stage before it (serial). source: context is taken from the source video, so all stages are independent"
+                }),
+            },
+            "optional": {
+                "mask": ("MASK",),
+            }
+        }
+
+    RETURN_TYPES = ("IMAGE", "MASK", "BOOLEAN", "INT", "INT")
+    RETURN_NAMES = ("stage_videos", "stage_masks", "independent", "wave", "num_waves")
+    OUTPUT_IS_LIST = (True, True, True, True, False)
+    FUNCTION = "slice"
+    CATEGORY = "video/wan"
+
+    def slice(self, video, plan_json, context_from="previous_generation", mask=None):
+        plan = json.loads(plan_json)
+        ranges = plan_stage_ranges(plan, video.shape[0])
+
+        stage_videos = [slice_frames(video, begin, end, pad) for begin, end, pad in ranges]
+        if mask is None:
+            mask = torch.ones((1,) + video.shape[1:3], dtype=torch.float32, device=video.device)
+        elif mask.dim() == 2:
+            mask = mask.unsqueeze(0)
+        stage_masks = [slice_frames(mask, begin, end, pad) for begin, end, pad in ranges]
+
+        independent, waves = stage_dependencies(plan["context_frames"], context_from)
+        return (stage_videos, stage_masks, independent, waves, max(waves) + 1)
 
 
 # Node exports
 NODE_CLASS_MAPPINGS = {
     "BadmanWanOutpaintFrameCalculator": WanOutpaintFrameCalculator,
+    "BadmanWanOutpaintStageSlicer": WanOutpaintStageSlicer,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "BadmanWanOutpaintFrameCalculator": "WAN Outpaint Frame Calculator (Badman)",
+    "BadmanWanOutpaintStageSlicer": "WAN Outpaint Stage Slicer (Badman)",
 }
 
@@ -1,49 +1,421 @@
 #Code Taken from https://github.com/bash-j/mikey_nodes
 
+import bisect
+import concurrent.futures
 import random
 import re
 import os
 import datetime
+import functools
 import json
+import mmap
+import struct
+import threading
+import time
+import numpy as np
 import folder_paths
 
+from .BadmanLogging import get_logger
 
+logger = get_logger("wildcards")
 
-def find_and_replace_wildcards(prompt, offset_seed, debug=False):
-    # wildcards use the __file_name__ syntax with optional |word_to_find
-    wildcard_path = os.path.join(folder_paths.input_directory, 'wildcards')
-    print(wildcard_path)
-    wildcard_regex = r'((\d+)\$\$)?__(!|\+|-|\*)?((?:[^|_]+_)*[^|_]+)((?:\|[^|]+)*)__'
-    # r'(\[(\d+)\$\$)?__((?:[^|_]+_)*[^|_]+)((?:\|[^|]+)*)__\]?'
-    match_strings = []
-    random.seed(offset_seed)
-    offset = offset_seed
-
-    new_prompt = ''
-    last_end = 0
 
-    for m in re.finditer(wildcard_regex, prompt):
-        full_match, lines_count_str, offset_type, actual_match, words_to_find_str = m.groups()
-        # Append everything up to this match
-        new_prompt += prompt[last_end:m.start()]
-
-        # lock indicator
-        lock_indicator = offset_type == '!'
-        # increment indicator
-        increment_indicator = offset_type == '+'
-        # decrement indicator
-        decrement_indicator = offset_type == '-'
-        # random indicator
-        random_indicator = offset_type == '*'
-
-    #for full_match, lines_count_str, actual_match, words_to_find_str in re.findall(wildcard_regex, prompt):
+_TOKEN_RE = re.compile(r'\w+')
+# Characters that match ASCII letters under re.IGNORECASE without lowercasing to them
+_IRREGULAR_CASE_CHARS = frozenset('\u0130\u0131\u017f\u212a')
+
+
+def _build_token_index(lines):
+    """
+    Map lowercase word tokens to the sorted numbers of the lines containing them.
+
+    Lines with characters whose case folding differs between str.lower() and
+    re.IGNORECASE are not indexed but returned separately, so lookups check
+    them with the regex and stay exact.
+    """
+    token_index = {}
+    irregular = []
+    for i, line in enumerate(lines):
+        if not line.isascii() and not _IRREGULAR_CASE_CHARS.isdisjoint(line):
+            irregular.append(i)
+            continue
+        for token in set(_TOKEN_RE.findall(line.lower())):
+            token_index.setdefault(token, []).append(i)
+    return token_index, irregular
+
+
+# Wildcard files at least this large are memory-mapped instead of read
+LARGE_WILDCARD_FILE_SIZE = 32 * 1024 * 1024
+_LINE_INDEX_SUFFIX = '.lineidx'
+_LINE_INDEX_MAGIC = b'BADMANLINEIDX1\n'
+_LINE_INDEX_HEADER = struct.Struct('<qqB')  # mtime_ns, size, offset itemsize
+_LINE_INDEX_CHUNK = 16 * 1024 * 1024
+_ASCII_WORD_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+_ASCII_WORD_TABLE = np.array([byte in _ASCII_WORD_BYTES for byte in range(256)])
+
+
+def _scan_line_starts(data):
+    """
+    Byte offsets of the lines in data, scanned in chunks.
+
+    Returns None if data has a lone carriage return, which text mode reads
+    as a line break too.
+    """
+    view = np.frombuffer(data, dtype=np.uint8)
+    starts = [np.zeros(1, dtype=np.int64)]
+    carriage_returns = 0
+    crlf = 0
+    chunk = None
+    for offset in range(0, len(view), _LINE_INDEX_CHUNK):
+        chunk = view[offset:offset + _LINE_INDEX_CHUNK]
+        newlines = np.flatnonzero(chunk == 10) + offset
+        carriage_returns += int(np.count_nonzero(chunk == 13))
+        crlf += int(np.count_nonzero(view[newlines[newlines > 0] - 1] == 13))
+        starts.append(newlines + 1)
+    size = len(view)
+    del view, chunk
+    if carriage_returns != crlf:
+        return None
+    starts = np.concatenate(starts)
+    if starts[-1] == size:
+        starts = starts[:-1]
+    return starts.astype(np.uint32 if size < 2 ** 32 else np.uint64)
+
+
+def _read_line_index(index_path, stat):
+    try:
+        with open(index_path, 'rb') as file:
+            if file.read(len(_LINE_INDEX_MAGIC)) != _LINE_INDEX_MAGIC:
+                return None
+            mtime_ns, size, itemsize = _LINE_INDEX_HEADER.unpack(file.read(_LINE_INDEX_HEADER.size))
+            if mtime_ns != stat.st_mtime_ns or size != stat.st_size:
+                return None
+            return np.fromfile(file, dtype=np.uint32 if itemsize == 4 else np.uint64)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _write_line_index(index_path, stat, starts):
+    """Persist the line offsets next to the file; read-only folders just skip it."""
+    temp_path = f'{index_path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(_LINE_INDEX_MAGIC)
+            file.write(_LINE_INDEX_HEADER.pack(stat.st_mtime_ns, stat.st_size, starts.itemsize))
+            starts.tofile(file)
+        os.replace(temp_path, index_path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+class MappedLines:
+    """
+    The stripped lines of a large wildcard file, read through mmap.
+
+    Behaves like the tuple of lines WildcardStore keeps for small files, but
+    only the line start offsets are held in memory and a line is decoded
+    when it is picked. The offsets are saved to a .lineidx file next to the
+    wildcard file and reused while its mtime and size match.
+    """
+
+    def __init__(self, file_path, stat):
+        with open(file_path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_path = file_path + _LINE_INDEX_SUFFIX
+        starts = _read_line_index(index_path, stat)
+        if starts is None:
+            starts = _scan_line_starts(self._mmap)
+            if starts is not None:
+                _write_line_index(index_path, stat, starts)
+        self._starts = starts
+        self._size = len(self._mmap)
+        self._non_ascii = None
+
+    @classmethod
+    def open(cls, file_path, stat):
+        """MappedLines for the file, or None if it can't be indexed by \\n alone."""
+        lines = cls(file_path, stat)
+        if lines._starts is None:
+            lines._mmap.close()
+            return None
+        return lines
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, i):
+        count = len(self._starts)
+        if i < 0:
+            i += count
+        if not 0 <= i < count:
+            raise IndexError('line index out of range')
+        end = int(self._starts[i + 1]) if i + 1 < count else self._size
+        return self._mmap[int(self._starts[i]):end].decode('utf-8').strip()
+
+    def __iter__(self):
+        for i in range(len(self._starts)):
+            yield self[i]
+
+    def _find(self, needles):
+        """Start offsets of each needle in the file, ignoring ASCII case."""
+        positions = [[] for _ in needles]
+        overlap = max(len(needle) for needle in needles) - 1
+        for offset in range(0, self._size, _LINE_INDEX_CHUNK):
+            chunk = np.frombuffer(self._mmap[offset:offset + _LINE_INDEX_CHUNK + overlap].lower(), dtype=np.uint8)
+            for needle, found in zip(needles, positions):
+                # Narrow the offsets of the first byte down byte by byte
+                limit = min(_LINE_INDEX_CHUNK, len(chunk) - len(needle) + 1)
+                starts = np.flatnonzero(chunk[:max(limit, 0)] == needle[0])
+                for i in range(1, len(needle)):
+                    starts = starts[chunk[starts + i] == needle[i]]
+                found.append(starts + offset)
+        return [np.concatenate(found) if found else np.zeros(0, dtype=np.int64) for found in positions]
+
+    def _line_numbers(self, positions):
+        return np.unique(np.searchsorted(self._starts, positions, side='right') - 1)
+
+    def _non_ascii_line_numbers(self):
+        if self._non_ascii is None:
+            view = np.frombuffer(self._mmap, dtype=np.uint8)
+            lines = [self._line_numbers(np.flatnonzero(view[offset:offset + _LINE_INDEX_CHUNK] >= 128) + offset)
+                     for offset in range(0, self._size, _LINE_INDEX_CHUNK)]
+            del view
+            self._non_ascii = np.unique(np.concatenate(lines))
+        return self._non_ascii
+
+    def search(self, word, pattern):
+        """
+        Sorted numbers of the lines pattern finds word in.
+
+        ASCII words are found in the raw bytes with a case-insensitive
+        substring search and a word boundary check that accepts any non-ASCII
+        neighbour, which gives a superset of the matching lines. That is
+        exact for ASCII lines; lines with non-ASCII text are decoded and
+        checked with the pattern, as are lines with irregular case characters.
+        """
+        if not word.isascii():
+            return [i for i, line in enumerate(self) if pattern.search(line)]
+        needle = word.encode('ascii').lower()
+        irregular = [char.encode('utf-8') for char in sorted(_IRREGULAR_CASE_CHARS)]
+        positions, *irregular_positions = self._find([needle] + irregular)
+
+        view = np.frombuffer(self._mmap, dtype=np.uint8)
+        before = np.where(positions > 0, view[np.maximum(positions - 1, 0)], 32)
+        end = positions + len(needle)
+        after = np.where(end < self._size, view[np.minimum(end, self._size - 1)], 32)
+        del view
+        first = needle[0] in _ASCII_WORD_BYTES
+        last = needle[-1] in _ASCII_WORD_BYTES
+        # \b before and after the word; a non-ASCII neighbour may be either
+        keep = (((before >= 128) | (_ASCII_WORD_TABLE[before] != first))
+                & ((after >= 128) | (_ASCII_WORD_TABLE[after] != last)))
+        candidates = self._line_numbers(positions[keep])
+
+        non_ascii = self._non_ascii_line_numbers()
+        check = np.union1d(candidates[np.isin(candidates, non_ascii)],
+                           self._line_numbers(np.concatenate(irregular_positions)))
+        found = candidates[~np.isin(candidates, non_ascii)].tolist()
+        found.extend(i for i in check.tolist() if pattern.search(self[i]))
+        found.sort()
+        return found
+
+
+class WildcardStore:
+    """
+    Loads wildcard files once and keeps their stripped lines in memory.
+
+    Files are re-stat'ed at most every check_interval seconds and reloaded
+    when their mtime or size changes, so files added to the wildcard folder
+    are picked up too.
+    Files of large_file_size bytes or more are memory-mapped (MappedLines)
+    instead of read into memory.
+    """
+
+    def __init__(self, root=None, check_interval=1.0, large_file_size=LARGE_WILDCARD_FILE_SIZE):
+        self._root = root
+        self.check_interval = check_interval
+        self.large_file_size = large_file_size
+        self._files = {}  # path -> [lines, mtime_ns, size, checked_at]
+        self._paths = {}  # (root, wildcard_dir, wildcard_file) -> path
+        self._indexes = {}  # path -> (lines, (token index, irregular lines) or None, word -> line numbers)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @property
+    def root(self):
+        if self._root is not None:
+            return self._root
+        return os.path.join(folder_paths.input_directory, 'wildcards')
+
+    def resolve(self, wildcard_dir, wildcard_file):
+        """
+        Path of a wildcard file under the root folder.
+
+        Only joins the path (once per name); whether the file exists is
+        left to lines(), which stats it anyway and returns None if not.
+        """
+        root = self.root
+        key = (root, wildcard_dir, wildcard_file)
+        file_path = self._paths.get(key)
+        if file_path is None:
+            file_path = os.path.join(root, wildcard_dir, wildcard_file + '.txt')
+            self._paths[key] = file_path
+        return file_path
+
+    def lines(self, file_path):
+        """Stripped lines of a wildcard file as a tuple, or None if it is gone."""
+        now = time.monotonic()
+        entry = self._files.get(file_path)
+        if entry is not None and now - entry[3] < self.check_interval:
+            self.hits += 1
+            return entry[0]
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            self._files.pop(file_path, None)
+            return None
+        with self._lock:
+            entry = self._files.get(file_path)
+            if entry is not None and entry[1] == stat.st_mtime_ns and entry[2] == stat.st_size:
+                entry[3] = now
+                self.hits += 1
+                return entry[0]
+            lines = None
+            if stat.st_size >= self.large_file_size:
+                lines = MappedLines.open(file_path, stat)
+            if lines is None:
+                try:
+                    with open(file_path, 'r', encoding='utf-8') as file:
+                        lines = tuple(line.strip() for line in file.readlines())
+                except (IsADirectoryError, PermissionError):
+                    return None
+            if entry is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+            self._files[file_path] = [lines, stat.st_mtime_ns, stat.st_size, now]
+            return lines
+
+    def matching_lines(self, file_path, lines, word):
+        """
+        Sorted numbers of the lines that contain word as a whole word (case-insensitive).
+
+        Plain ASCII words are looked up in an inverted token index that is
+        built on first use for each version of the file. Other words (spaces,
+        punctuation, non-ASCII) are matched once with a compiled regex and the
+        result is cached alongside the index.
+        """
+        entry = self._indexes.get(file_path)
+        if entry is None or entry[0] is not lines:
+            entry = (lines, None, {})
+            self._indexes[file_path] = entry
+        cache = entry[2]
+        key = word.lower()
+        found = cache.get(key)
+        if found is not None:
+            return found
+        pattern = re.compile(r'\b' + re.escape(word) + r'\b', re.IGNORECASE)
+        if isinstance(lines, MappedLines):
+            found = lines.search(word, pattern)
+        elif word.isascii() and _TOKEN_RE.fullmatch(word):
+            if entry[1] is None:
+                entry = (lines, _build_token_index(lines), cache)
+                self._indexes[file_path] = entry
+            token_index, irregular = entry[1]
+            found = token_index.get(key, [])
+            if irregular:
+                found = sorted(set(found).union(i for i in irregular if pattern.search(lines[i])))
+        else:
+            found = [i for i, line in enumerate(lines) if pattern.search(line)]
+        cache[key] = found
+        return found
+
+    def preload(self):
+        """
+        Resolve and load every wildcard file under the root folder.
+
+        Fills the same caches a prompt would, so the first prompt after a
+        server start does not wait for cold disk reads.
+        """
+        start = time.monotonic()
+        root = self.root
+        count = 0
+        for dirpath, _, filenames in os.walk(root):
+            wildcard_dir = os.path.relpath(dirpath, root)
+            if wildcard_dir == '.':
+                wildcard_dir = ''
+            for filename in filenames:
+                if not filename.endswith('.txt'):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                self._paths[(root, wildcard_dir, filename[:-4])] = file_path
+                try:
+                    self.lines(file_path)
+                except (OSError, UnicodeDecodeError) as e:
+                    logger.warning('Could not preload wildcard file %s: %s', file_path, e)
+                    continue
+                count += 1
+        logger.info('Preloaded %d wildcard files from %s in %.2fs', count, root, time.monotonic() - start)
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+            self._paths.clear()
+            self._indexes.clear()
+
+    def stats(self):
+        return {'files': len(self._files), 'hits': self.hits, 'misses': self.misses, 'reloads': self.reloads}
+
+
+WILDCARD_STORE = WildcardStore()
+
+
+def preload_wildcards(store=WILDCARD_STORE):
+    """Preload the wildcard library on a background thread."""
+    thread = threading.Thread(target=store.preload, name='BadmanWildcardPreload', daemon=True)
+    thread.start()
+    return thread
+
+
+# Opt-in: warm the wildcard cache at server start (BADMAN_WILDCARD_PRELOAD=1)
+if os.environ.get('BADMAN_WILDCARD_PRELOAD', '0') == '1':
+    preload_wildcards()
+
+
+WILDCARD_REGEX = re.compile(r'((\d+)\$\$)?__(!|\+|-|\*)?((?:[^|_]+_)*[^|_]+)((?:\|[^|]+)*)__')
+
+
+class WildcardPicker:
+    """
+    Selects wildcard lines for the matches of one wildcard pass.
+
+    Holds the per-pass state of the __file__ syntax: the running line offset
+    and the names already used, which make repeated wildcards pick different
+    lines (or the same line with the ! lock indicator).
+    """
+
+    def __init__(self, offset_seed, rng, debug=False):
+        self.offset_seed = offset_seed
+        self.offset = offset_seed
+        self.rng = rng
+        self.debug = debug
+        self.match_strings = set()
+
+    def pick(self, lines_count_str, offset_type, actual_match, words_to_find_str):
+        """Replacement text for one wildcard match ('' if the file does not exist)."""
         words_to_find = words_to_find_str.split('|')[1:] if words_to_find_str else None
-        if debug:
-            print(f'Wildcard match: {actual_match}')
-            print(f'Wildcard words to find: {words_to_find}')
+        if self.debug:
+            logger.info('Wildcard match: %s', actual_match)
+            logger.info('Wildcard words to find: %s', words_to_find)
         lines_to_insert = int(lines_count_str) if lines_count_str else 1
-        if debug:
-            print(f'Wildcard lines to insert: {lines_to_insert}')
+        if self.debug:
+            logger.info('Wildcard lines to insert: %d', lines_to_insert)
         match_parts = actual_match.split('/')
         if len(match_parts) > 1:
             wildcard_dir = os.path.join(*match_parts[:-1])
@@ -51,194 +423,391 @@ def find_and_replace_wildcards(prompt, offset_seed, debug=False):
         else:
             wildcard_dir = ''
             wildcard_file = match_parts[0]
-        search_path = os.path.join(wildcard_path, wildcard_dir)
-        file_path = os.path.join(search_path, wildcard_file + '.txt')
-        if not os.path.isfile(file_path) and wildcard_dir == '':
-            file_path = os.path.join(wildcard_path, wildcard_file + '.txt')
-        if os.path.isfile(file_path):
-            store_offset = None
-            if actual_match in match_strings:
-                store_offset = offset
-                if lock_indicator:
-                    offset = offset_seed
-                elif random_indicator:
-                    offset = random.randint(0, 1000000)
-                elif increment_indicator:
-                    offset = offset_seed + 1
-                elif decrement_indicator:
-                    offset = offset_seed - 1
-                else:
-                    offset = random.randint(0, 1000000)
-            selected_lines = []
-            with open(file_path, 'r', encoding='utf-8') as file:
-                file_lines = file.readlines()
-                num_lines = len(file_lines)
-                if words_to_find:
-                    for i in range(lines_to_insert):
-                        start_idx = (offset + i) % num_lines
-                        for j in range(num_lines):
-                            line_number = (start_idx + j) % num_lines
-                            line = file_lines[line_number].strip()
-                            if any(re.search(r'\b' + re.escape(word) + r'\b', line, re.IGNORECASE) for word in words_to_find):
-                                selected_lines.append(line)
-                                break
-                else:
-                    start_idx = offset % num_lines
-                    for i in range(lines_to_insert):
-                        line_number = (start_idx + i) % num_lines
-                        line = file_lines[line_number].strip()
-                        selected_lines.append(line)
-            if len(selected_lines) == 1:
-                replacement_text = selected_lines[0]
+        file_path = WILDCARD_STORE.resolve(wildcard_dir, wildcard_file)
+        file_lines = WILDCARD_STORE.lines(file_path)
+        if file_lines is None:
+            if self.debug:
+                logger.info('Wildcard file %s.txt not found in %s', wildcard_file, os.path.join(WILDCARD_STORE.root, wildcard_dir))
+            return ''
+
+        offset = self.offset
+        if actual_match in self.match_strings:
+            if offset_type == '!':
+                # lock indicator
+                offset = self.offset_seed
+            elif offset_type == '+':
+                # increment indicator
+                offset = self.offset_seed + 1
+            elif offset_type == '-':
+                # decrement indicator
+                offset = self.offset_seed - 1
             else:
-                replacement_text = ','.join(selected_lines)
-            new_prompt += replacement_text
-            match_strings.append(actual_match)
-            if store_offset is not None:
-                offset = store_offset
-                store_offset = None
-            offset += lines_to_insert
-            if debug:
-                print('Wildcard prompt selected: ' + replacement_text)
+                # random indicator (*) or plain repeat
+                offset = self.rng.randint(0, 1000000)
+        selected_lines = []
+        num_lines = len(file_lines)
+        if words_to_find and num_lines:
+            matches = [WILDCARD_STORE.matching_lines(file_path, file_lines, word) for word in words_to_find]
+            matches = [found for found in matches if found]
+            for i in range(lines_to_insert):
+                start_idx = (offset + i) % num_lines
+                # First matching line at or after start_idx, wrapping around
+                best = None
+                for found in matches:
+                    pos = bisect.bisect_left(found, start_idx)
+                    line_number = found[pos] if pos < len(found) else found[0] + num_lines
+                    if best is None or line_number < best:
+                        best = line_number
+                if best is not None:
+                    selected_lines.append(file_lines[best % num_lines])
+        elif num_lines:
+            start_idx = offset % num_lines
+            for i in range(lines_to_insert):
+                line_number = (start_idx + i) % num_lines
+                selected_lines.append(file_lines[line_number])
+        if len(selected_lines) == 1:
+            replacement_text = selected_lines[0]
         else:
-            if debug:
-                print(f'Wildcard file {wildcard_file}.txt not found in {search_path}')
+            replacement_text = ','.join(selected_lines)
+        self.match_strings.add(actual_match)
+        # A repeated match only borrows its offset, the running offset continues
+        self.offset += lines_to_insert
+        if self.debug:
+            logger.info('Wildcard prompt selected: %s', replacement_text)
+        return replacement_text
+
+
+def find_and_replace_wildcards(prompt, offset_seed, debug=False, rng=None):
+    # wildcards use the __file_name__ syntax with optional |word_to_find
+    # rng defaults to a fresh random.Random(offset_seed), the global random module is left alone
+    if rng is None:
+        rng = random.Random(offset_seed)
+    picker = WildcardPicker(offset_seed, rng, debug)
+
+    new_prompt = []
+    last_end = 0
+    for m in WILDCARD_REGEX.finditer(prompt):
+        full_match, lines_count_str, offset_type, actual_match, words_to_find_str = m.groups()
+        # Append everything up to this match
+        new_prompt.append(prompt[last_end:m.start()])
+        new_prompt.append(picker.pick(lines_count_str, offset_type, actual_match, words_to_find_str))
         last_end = m.end()
-    new_prompt += prompt[last_end:]
-    return new_prompt
+    new_prompt.append(prompt[last_end:])
+    return ''.join(new_prompt)
 
-def process_wildcard_syntax(text, seed):
-    # wildcard sytax is {like|this}
-    # select a random word from the | separated list
-    random.seed(seed)
-    wc_re = re.compile(r'{([^{}]*)}')
-    def repl(m):
-        parts = m.group(1).split('|')
-        return random.choice(parts)
-    while wc_re.search(text):
-        text = wc_re.sub(repl, text)
-    return text
 
-def search_and_replace(text, extra_pnginfo, prompt):
-    if extra_pnginfo is None or prompt is None:
+_WEIGHT_REGEX = re.compile(r'\s*(\d+(?:\.\d+)?)::')
+_BRACE_REGEX = re.compile(r'[{}|]')
+_INNERMOST_GROUP_REGEX = re.compile(r'{([^{}]*)}')
+_REGEX_SWEEPS = 8
+
+
+class _BraceGroup:
+    __slots__ = ('open', 'close', 'pipes', 'children', 'height')
+
+    def __init__(self, open_index):
+        self.open = open_index
+        self.close = -1
+        self.pipes = []
+        self.children = []
+        self.height = 0
+
+
+def _match_brace_groups(text):
+    """
+    Match {a|b} groups the way repeated innermost substitution does.
+
+    A } closes the nearest open {, unmatched braces stay literal text and
+    so do the pipes of an unmatched {. Returns the outermost matched groups
+    and all matched groups in drawing order (innermost level first, left to
+    right within a level).
+    """
+    stack = []
+    top_level = []
+    groups = []
+    for m in _BRACE_REGEX.finditer(text):
+        char = m.group()
+        i = m.start()
+        if char == '{':
+            stack.append(_BraceGroup(i))
+        elif char == '|':
+            if stack:
+                stack[-1].pipes.append(i)
+        elif stack:
+            group = stack.pop()
+            group.close = i
+            group.height = max((child.height + 1 for child in group.children), default=0)
+            groups.append(group)
+            (stack[-1].children if stack else top_level).append(group)
+    # Groups inside an unmatched { are resolved as if they were top level
+    for group in stack:
+        top_level.extend(group.children)
+    top_level.sort(key=lambda group: group.open)
+    groups.sort(key=lambda group: (group.height, group.open))
+    return top_level, groups
+
+
+def _option_weights(text, starts, ends):
+    """Weights of N::option prefixes, or None if no option has one."""
+    matches = [_WEIGHT_REGEX.match(text, start, end) for start, end in zip(starts, ends)]
+    if not any(matches):
+        return None, starts
+    weights = [float(m.group(1)) if m else 1.0 for m in matches]
+    return weights, [m.end() if m else start for m, start in zip(matches, starts)]
+
+
+def expand_brace_groups(text, rng, weighted=True):
+    """
+    Resolve every {a|b} group of text in one pass with a brace stack.
+
+    Groups are drawn in the order the innermost-first substitution draws
+    them, so the result matches it for the same rng state. With weighted,
+    options starting with N:: are picked with rng.choices.
+    """
+    top_level, groups = _match_brace_groups(text)
+    if not groups:
         return text
-    # if %date: in text, then replace with date
-    #print(text)
-    if '%date:' in text:
-        for match in re.finditer(r'%date:(.*?)%', text):
-            date_match = match.group(1)
-            cursor = 0
-            date_pattern = ''
-            now = datetime.datetime.now()
-
-            pattern_map = {
-                'yyyy': now.strftime('%Y'),
-                'yy': now.strftime('%y'),
-                'MM': now.strftime('%m'),
-                'M': now.strftime('%m').lstrip('0'),
-                'dd': now.strftime('%d'),
-                'd': now.strftime('%d').lstrip('0'),
-                'hh': now.strftime('%H'),
-                'h': now.strftime('%H').lstrip('0'),
-                'mm': now.strftime('%M'),
-                'm': now.strftime('%M').lstrip('0'),
-                'ss': now.strftime('%S'),
-                's': now.strftime('%S').lstrip('0')
-            }
-
-            sorted_keys = sorted(pattern_map.keys(), key=len, reverse=True)
-
-            while cursor < len(date_match):
-                replaced = False
-                for key in sorted_keys:
-                    if date_match.startswith(key, cursor):
-                        date_pattern += pattern_map[key]
-                        cursor += len(key)
-                        replaced = True
-                        break
-                if not replaced:
-                    date_pattern += date_match[cursor]
-                    cursor += 1
-
-            text = text.replace('%date:' + match.group(1) + '%', date_pattern)
-    # Parse JSON if they are strings
-    if isinstance(extra_pnginfo, str):
-        extra_pnginfo = json.loads(extra_pnginfo)
-    if isinstance(prompt, str):
-        prompt = json.loads(prompt)
-
-    # Map from "Node name for S&R" to id in the workflow
-    node_to_id_map = {}
-    try:
+
+    # Draw every group, including those inside options that end up unused
+    check_weights = weighted and '::' in text
+    chosen = {}
+    for group in groups:
+        ends = group.pipes + [group.close]
+        starts = [group.open + 1] + [pipe + 1 for pipe in group.pipes]
+        weights = None
+        if check_weights:
+            weights, starts = _option_weights(text, starts, ends)
+        if weights is None or not sum(weights) > 0:
+            option = rng.choice(range(len(ends)))
+        else:
+            option = rng.choices(range(len(ends)), weights)[0]
+        chosen[group.open] = (starts[option], ends[option])
+
+    # Emit the chosen option of every group, outermost first, without recursion
+    # so deeply nested prompts don't hit the recursion limit
+    out = []
+    frames = [(0, len(text), top_level, 0)]
+    while frames:
+        pos, end, children, index = frames.pop()
+        while index < len(children) and children[index].close < end:
+            child = children[index]
+            index += 1
+            if child.open < pos:
+                continue
+            out.append(text[pos:child.open])
+            frames.append((child.close + 1, end, children, index))
+            (pos, end), children, index = chosen[child.open], child.children, 0
+        out.append(text[pos:end])
+    return ''.join(out)
+
+
+def process_wildcard_syntax(text, seed, rng=None):
+    # wildcard sytax is {like|this}
+    # select a random word from the | separated list, {2::likely|unlikely} weights options
+    if rng is None:
+        rng = random.Random(seed)
+    if '::' not in text:
+        # Shallow nesting is cheapest with a few regex sweeps, each resolving
+        # one level of innermost groups. Deeper levels continue on the stack
+        # expander with the same random state, which draws in the same order.
+        def repl(m):
+            parts = m.group(1).split('|')
+            return rng.choice(parts)
+        for _ in range(_REGEX_SWEEPS):
+            text, count = _INNERMOST_GROUP_REGEX.subn(repl, text)
+            if not count:
+                return text
+        return expand_brace_groups(text, rng, weighted=False)
+    return expand_brace_groups(text, rng)
+
+_DATE_REGEX = re.compile(r'%date:(.*?)%')
+_DATE_TOKEN_REGEX = re.compile(r'yyyy|yy|MM|dd|hh|mm|ss|M|d|h|m|s')
+# strftime code and whether leading zeros are stripped, per date token
+_DATE_TOKENS = {
+    'yyyy': ('%Y', False), 'yy': ('%y', False),
+    'MM': ('%m', False), 'M': ('%m', True),
+    'dd': ('%d', False), 'd': ('%d', True),
+    'hh': ('%H', False), 'h': ('%H', True),
+    'mm': ('%M', False), 'm': ('%M', True),
+    'ss': ('%S', False), 's': ('%S', True),
+}
+_WIDGET_REGEX = re.compile(r'%([^%]+)%')
+
+
+@functools.lru_cache(maxsize=64)
+def compile_date_pattern(date_pattern):
+    """
+    Split a %date:...% pattern into literal text and date tokens.
+
+    Tokens are matched longest first (yyyy before yy, MM before M, ...).
+    Returns a tuple of (text, None) literals and (strftime code, strip) fields.
+    """
+    parts = []
+    last_end = 0
+    for m in _DATE_TOKEN_REGEX.finditer(date_pattern):
+        if m.start() > last_end:
+            parts.append((date_pattern[last_end:m.start()], None))
+        parts.append(_DATE_TOKENS[m.group()])
+        last_end = m.end()
+    if last_end < len(date_pattern):
+        parts.append((date_pattern[last_end:], None))
+    return tuple(parts)
+
+
+def format_date_pattern(date_pattern, now):
+    out = []
+    for value, strip in compile_date_pattern(date_pattern):
+        if strip is None:
+            out.append(value)
+        elif strip:
+            out.append(now.strftime(value).lstrip('0'))
+        else:
+            out.append(now.strftime(value))
+    return ''.join(out)
+
+
+class WorkflowIndex:
+    """Node name -> id -> widget inputs lookups for one execution's workflow and prompt."""
+
+    def __init__(self, extra_pnginfo, prompt):
+        # Parse JSON if they are strings
+        if isinstance(extra_pnginfo, str):
+            extra_pnginfo = json.loads(extra_pnginfo)
+        if isinstance(prompt, str):
+            prompt = json.loads(prompt)
+        self.prompt = prompt
+        # Map from "Node name for S&R" to id in the workflow
+        self.node_to_id_map = {}
         for node in extra_pnginfo['workflow']['nodes']:
             node_name = node['properties'].get('Node name for S&R')
-            node_id = node['id']
-            node_to_id_map[node_name] = node_id
-    except:
-        return text
-
-    # Find all patterns in the text that need to be replaced
-    patterns = re.findall(r"%([^%]+)%", text)
-    for pattern in patterns:
-        # Split the pattern to get the node name and widget name
-        node_name, widget_name = pattern.split('.')
+            self.node_to_id_map[node_name] = node['id']
+        try:
+            self.node_ids = set(self.node_to_id_map.values())
+        except TypeError:
+            self.node_ids = list(self.node_to_id_map.values())
 
+    def widget_value(self, node_name, widget_name):
+        """Value of a widget of a node given by its S&R name (or id), or None."""
         # Find the id for this node name
-        node_id = node_to_id_map.get(node_name)
+        node_id = self.node_to_id_map.get(node_name)
         if node_id is None:
-            print(f"No node with name {node_name} found.")
+            logger.warning("No node with name %s found.", node_name)
             # check if user entered id instead of node name
-            if node_name in node_to_id_map.values():
+            if node_name in self.node_ids:
                 node_id = node_name
             else:
-                continue
+                return None
 
         # Find the value of the specified widget in prompt JSON
-        prompt_node = prompt.get(str(node_id))
+        prompt_node = self.prompt.get(str(node_id))
         if prompt_node is None:
-            print(f"No prompt data for node with id {node_id}.")
-            continue
+            logger.warning("No prompt data for node with id %s.", node_id)
+            return None
 
         widget_value = prompt_node['inputs'].get(widget_name)
         if widget_value is None:
-            print(f"No widget with name {widget_name} found for node {node_name}.")
-            continue
+            logger.warning("No widget with name %s found for node %s.", widget_name, node_name)
+        return widget_value
 
-        # Replace the pattern in the text
-        text = text.replace(f"%{pattern}%", str(widget_value))
 
-    return text
+# (extra_pnginfo, prompt, index) of the last execution. Every pass and every
+# batch variant of an execution passes the same objects, so the index is
+# built once per execution.
+_workflow_index_cache = (None, None, None)
+
+
+def get_workflow_index(extra_pnginfo, prompt):
+    """Cached WorkflowIndex for these exact objects, or None if the workflow can't be read."""
+    global _workflow_index_cache
+    cached_pnginfo, cached_prompt, index = _workflow_index_cache
+    if cached_pnginfo is extra_pnginfo and cached_prompt is prompt:
+        return index
+    try:
+        index = WorkflowIndex(extra_pnginfo, prompt)
+    except Exception:
+        index = None
+    _workflow_index_cache = (extra_pnginfo, prompt, index)
+    return index
+
+
+def search_and_replace(text, extra_pnginfo, prompt):
+    if extra_pnginfo is None or prompt is None:
+        return text
+    # if %date: in text, then replace with date
+    if '%date:' in text:
+        now = datetime.datetime.now()
+        text = _DATE_REGEX.sub(lambda m: format_date_pattern(m.group(1), now), text)
+    if '%' not in text:
+        return text
+
+    index = get_workflow_index(extra_pnginfo, prompt)
+    if index is None:
+        return text
+
+    # Look every token up once, in order, so the messages for missing nodes
+    # and widgets are printed as before
+    values = []
+    for pattern in _WIDGET_REGEX.findall(text):
+        # Split the pattern to get the node name and widget name
+        node_name, widget_name = pattern.split('.')
+        widget_value = index.widget_value(node_name, widget_name)
+        if widget_value is not None:
+            values.append((pattern, str(widget_value)))
+    if not values:
+        return text
+
+    if any('%' in value for _, value in values):
+        # A value can contain tokens itself, keep the one-by-one replacement
+        for pattern, value in values:
+            text = text.replace(f"%{pattern}%", value)
+        return text
+    replacements = dict(values)
+    return _WIDGET_REGEX.sub(lambda m: replacements.get(m.group(1), m.group(0)), text)
+
+# <lora:...>, <style:...>, __wildcard__ (with |words and an N$$ count) and [N$...]
+_STRIP_SYNTAX_REGEX = re.compile(r'<(?:lora|style):.*?>|(?:\d+\$\$)?__.*?__|\[\d+\$.*?\]')
+# Runs of commas (with the spaces around them) and runs of spaces
+_STRIP_CLEANUP_REGEX = re.compile(r' *,[ ,]*| {2,}')
+# Characters of partial syntax left over
+_STRIP_LEFTOVER_TABLE = str.maketrans('', '', '<>[]_')
+
+
+def _clean_separator(m):
+    separator = m.group()
+    if ',' not in separator:
+        return ' '
+    return ', ' if separator.endswith(' ') else ','
+
 
 def strip_all_syntax(text):
-    # replace any <lora:lora_name> with nothing
-    text = re.sub(r'<lora:(.*?)>', '', text)
-    # replace any <lora:lora_name:multiplier> with nothing
-    text = re.sub(r'<lora:(.*?):(.*?)>', '', text)
-    # replace any <style:style_name> with nothing
-    text = re.sub(r'<style:(.*?)>', '', text)
-    # replace any __wildcard_name__ with nothing
-    text = re.sub(r'__(.*?)__', '', text)
-    # replace any __wildcard_name|word__ with nothing
-    text = re.sub(r'__(.*?)\|(.*?)__', '', text)
-    # replace any [2$__wildcard__] with nothing
-    text = re.sub(r'\[\d+\$(.*?)\]', '', text)
-    # replace any [2$__wildcard|word__] with nothing
-    text = re.sub(r'\[\d+\$(.*?)\|(.*?)\]', '', text)
-    # replace double spaces with single spaces
-    text = text.replace('  ', ' ')
-    # replace double commas with single commas
-    text = text.replace(',,', ',')
-    # replace ` , ` with `, `
-    text = text.replace(' , ', ', ')
-    # replace leading and trailing spaces and commas
-    text = text.strip(' ,')
+    # remove loras, styles and wildcards in one pass, leftmost match first
+    text = _STRIP_SYNTAX_REGEX.sub('', text)
     # clean up any < > [ ] or _ that are left over
-    text = text.replace('<', '').replace('>', '').replace('[', '').replace(']', '').replace('_', '')
-    return text
+    text = text.translate(_STRIP_LEFTOVER_TABLE)
+    # collapse repeated commas and spaces, `a , , b` becomes `a, b`
+    text = _STRIP_CLEANUP_REGEX.sub(_clean_separator, text)
+    # remove leading and trailing spaces and commas
+    return text.strip(' ,')
 
-def process_random_syntax(text, seed):
+
+def iter_strip_all_syntax(lines):
+    """
+    Strip syntax from an iterable of lines, e.g. an open prompt file.
+
+    Yields one cleaned line (without its line break) per input line, so
+    files of any size are processed in constant memory:
+
+        with open(src) as f_in, open(dst, 'w') as f_out:
+            f_out.writelines(line + '\n' for line in iter_strip_all_syntax(f_in))
+    """
+    for line in lines:
+        yield strip_all_syntax(line.rstrip('\r\n'))
+
+
+def process_random_syntax(text, seed, rng=None):
     #print('checking for random syntax')
-    random.seed(seed)
+    if rng is None:
+        rng = random.Random(seed)
     random_re = r'<random:(-?\d*\.?\d+):(-?\d*\.?\d+)>'
     matches = re.finditer(random_re, text)
 
@@ -249,7 +818,7 @@ def process_random_syntax(text, seed):
     # Iterate through matches
     for match in matches:
         lower_bound, upper_bound = map(float, match.groups())
-        random_value = random.uniform(lower_bound, upper_bound)
+        random_value = rng.uniform(lower_bound, upper_bound)
         random_value = round(random_value, 4)
 
         # Append text up to the match and the generated number
@@ -270,6 +839,247 @@ def process_random_syntax(text, seed):
 
 
 
+RANDOM_REGEX = re.compile(r'<random:(-?\d*\.?\d+):(-?\d*\.?\d+)>')
+_TAG_REGEX = re.compile(r'<[^<>]*>')
+MAX_WILDCARD_PASSES = 11
+
+
+class _Choice:
+    """A {a|b|c} group; options are tuples of nodes, weights None unless N:: is used."""
+    __slots__ = ('options', 'weights', 'height', 'position', 'order')
+
+    def __init__(self, options, weights, height, position):
+        self.options = options
+        self.weights = weights
+        self.height = height
+        self.position = position
+        self.order = 0
+
+
+class WildcardTemplate:
+    """
+    A prompt compiled for one pass of the wildcard processor.
+
+    The text is parsed once into literal text, {a|b} choices (optionally
+    weighted as {2::a|b}), <random:a:b> values and __wildcard__ matches. Expanding a pass draws every choice,
+    random value and wildcard in the same order as the regex based
+    functions above, so the output is identical for a given seed.
+
+    Templates that the legacy passes could read differently are marked
+    unsafe and expanded with those functions instead: text containing %,
+    unbalanced braces, stray $ or __, < or > outside a complete tag, text
+    that starts or ends with _ next to a choice, random value or other
+    segment, a count-prefixed wildcard right after one, and a filtered
+    wildcard followed by more __ (its word list is matched greedily).
+    """
+    __slots__ = ('text', 'nodes', 'choices', 'safe')
+
+    def __init__(self, text):
+        self.text = text
+        self.choices = []
+        self.safe = '%' not in text
+        self.nodes = self._parse(text) if self.safe else ()
+        # Choices are drawn innermost first, left to right within a level,
+        # which is the order of the repeated innermost-group substitution
+        self.choices.sort(key=lambda choice: (choice.height, choice.position))
+        for order, choice in enumerate(self.choices):
+            choice.order = order
+
+    def _parse(self, text):
+        # Stack of open groups: (position of the brace, finished options, their
+        # weights, enclosing node list, weight of the enclosing option)
+        stack = []
+        current = []
+        weight = None
+        leaf_start = 0
+        for i, char in enumerate(text):
+            if char not in '{|}' or (char == '|' and not stack):
+                continue
+            if leaf_start < i:
+                if stack and not current:
+                    m = _WEIGHT_REGEX.match(text, leaf_start, i)
+                    if m:
+                        weight = float(m.group(1))
+                        leaf_start = m.end()
+                current.extend(self._leaf(text, leaf_start, i))
+            leaf_start = i + 1
+            if char == '{':
+                stack.append((i, [], [], current, weight))
+                current = []
+                weight = None
+            elif char == '|':
+                stack[-1][1].append(tuple(current))
+                stack[-1][2].append(weight)
+                current = []
+                weight = None
+            else:
+                if not stack:
+                    self.safe = False
+                    return ()
+                position, options, weights, parent, parent_weight = stack.pop()
+                options.append(tuple(current))
+                weights.append(weight)
+                weight = parent_weight
+                if any(w is not None for w in weights):
+                    weights = [1.0 if w is None else w for w in weights]
+                    if not sum(weights) > 0:
+                        weights = None
+                else:
+                    weights = None
+                height = max((node.height + 1 for option in options for node in option
+                              if type(node) is _Choice), default=0)
+                choice = _Choice(tuple(options), weights, height, position)
+                self.choices.append(choice)
+                parent.append(choice)
+                current = parent
+        if stack:
+            self.safe = False
+            return ()
+        if leaf_start < len(text):
+            current.extend(self._leaf(text, leaf_start, len(text)))
+        return tuple(current)
+
+    def _leaf(self, text, start, end):
+        """Tokenize text between braces and pipes into text, randoms and wildcards."""
+        leaf = text[start:end]
+        if ('<' in leaf or '>' in leaf) and ('<' in _TAG_REGEX.sub('', leaf) or '>' in _TAG_REGEX.sub('', leaf)):
+            self.safe = False
+        tokens = []
+        last_end = 0
+        for m in RANDOM_REGEX.finditer(leaf):
+            self._segment(text, start + last_end, leaf[last_end:m.start()], tokens)
+            tokens.append(('random', float(m.group(1)), float(m.group(2))))
+            last_end = m.end()
+        self._segment(text, start + last_end, leaf[last_end:], tokens)
+        return tokens
+
+    def _segment(self, text, start, segment, tokens):
+        """Tokenize wildcards in a run of text that no other syntax interrupts."""
+        if not segment:
+            return
+        first = len(tokens)
+        last_end = 0
+        for m in WILDCARD_REGEX.finditer(segment):
+            if m.start() > last_end:
+                tokens.append(segment[last_end:m.start()])
+            if m.start() == 0 and m.group(1) is not None:
+                # Digits in front of this segment would change the line count
+                self.safe = False
+            if m.group(5) and '__' in text[start + m.end():]:
+                # The word list is matched greedily up to the last __
+                self.safe = False
+            tokens.append(('wildcard', m.group(0)) + m.groups()[1:])
+            last_end = m.end()
+        if last_end < len(segment):
+            tokens.append(segment[last_end:])
+        for token in tokens[first:]:
+            if type(token) is str and ('__' in token or '$' in token):
+                self.safe = False
+        # Underscores at the edges could join the neighbouring text into __
+        if (type(tokens[first]) is str and segment[0] == '_') or (type(tokens[-1]) is str and segment[-1] == '_'):
+            self.safe = False
+
+    def expand(self, seed, debug=False):
+        """
+        Run one wildcard pass.
+
+        Returns:
+            tuple: (text before wildcard replacement, text after it)
+        """
+        rng = random.Random(seed)
+        chosen = [rng.choice(choice.options) if choice.weights is None
+                  else rng.choices(choice.options, choice.weights)[0]
+                  for choice in self.choices]
+
+        tokens = []
+        self._flatten(self.nodes, chosen, tokens)
+
+        rng = random.Random(seed)
+        picker = WildcardPicker(seed, random.Random(seed), debug)
+        before = []
+        after = []
+        for token in tokens:
+            if type(token) is str:
+                before.append(token)
+                after.append(token)
+            elif token[0] == 'random':
+                value = str(round(rng.uniform(token[1], token[2]), 4))
+                before.append(value)
+                after.append(value)
+            else:
+                before.append(token[1])
+                after.append(picker.pick(*token[2:]))
+        return ''.join(before), ''.join(after)
+
+    @staticmethod
+    def _flatten(nodes, chosen, tokens):
+        # Iterative so deeply nested prompts don't hit the recursion limit
+        frames = [(nodes, 0)]
+        while frames:
+            nodes, index = frames.pop()
+            while index < len(nodes):
+                node = nodes[index]
+                index += 1
+                if type(node) is _Choice:
+                    frames.append((nodes, index))
+                    nodes, index = chosen[node.order], 0
+                else:
+                    tokens.append(node)
+
+
+@functools.lru_cache(maxsize=512)
+def compile_wildcard_template(text):
+    return WildcardTemplate(text)
+
+
+def expand_wildcard_prompt(prompt, seed, extra_pnginfo=None, prompt_=None):
+    """
+    Expand %node.widget%, {a|b}, <random:a:b> and __wildcard__ syntax.
+
+    Runs up to MAX_WILDCARD_PASSES passes so syntax inside wildcard files is
+    expanded too, stopping at the first pass that replaces no wildcard.
+    Each pass uses a compiled template when it is safe and the legacy
+    regex functions otherwise.
+    """
+    text = prompt
+    for _ in range(MAX_WILDCARD_PASSES):
+        template = compile_wildcard_template(text)
+        if template.safe:
+            before, after = template.expand(seed)
+        else:
+            before = search_and_replace(text, extra_pnginfo, prompt_)
+            before = process_wildcard_syntax(before, seed)
+            before = process_random_syntax(before, seed)
+            after = find_and_replace_wildcards(before, seed)
+        if after == before:
+            return after
+        text = after
+    return text
+
+
+def expand_wildcard_prompts(prompt, seeds, extra_pnginfo=None, prompt_=None, threads=0):
+    """
+    Expand one prompt for many seeds.
+
+    %node.widget% and %date:...% references don't depend on the seed, so
+    they are resolved once up front. When that leaves no % in the prompt,
+    every seed starts from the same compiled template and the wildcard
+    files are already cached after the first one. With threads > 0 the
+    seeds are expanded on a thread pool.
+    """
+    text = search_and_replace(prompt, extra_pnginfo, prompt_)
+    if '%' in text:
+        text = prompt
+
+    def expand(seed):
+        return expand_wildcard_prompt(text, seed, extra_pnginfo, prompt_)
+
+    if threads > 0 and len(seeds) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+            return list(pool.map(expand, seeds))
+    return [expand(seed) for seed in seeds]
+
+
 class BadmanWildCardProcessor:
     @classmethod
     def INPUT_TYPES(s):
@@ -286,18 +1096,28 @@ class BadmanWildCardProcessor:
             prompt_ = {}
         if extra_pnginfo is None:
             extra_pnginfo = {}
-        prompt = search_and_replace(prompt, extra_pnginfo, prompt_)
-        prompt = process_wildcard_syntax(prompt, seed)
-        prompt = process_random_syntax(prompt, seed)
-        new_prompt = find_and_replace_wildcards(prompt, seed)
-        # loop to pick up wildcards that are in wildcard files
-        if new_prompt != prompt:
-            for i in range(10):
-                prompt = new_prompt
-                prompt = search_and_replace(prompt, extra_pnginfo, prompt_)
-                prompt = process_wildcard_syntax(prompt, seed)
-                prompt = process_random_syntax(prompt, seed)
-                new_prompt = find_and_replace_wildcards(prompt, seed)
-                if new_prompt == prompt:
-                    break
-        return (new_prompt, )
\ No newline at end of file
+        return (expand_wildcard_prompt(prompt, seed, extra_pnginfo, prompt_), )
+
+
+class BadmanWildCardBatchProcessor:
+    @classmethod
+    def INPUT_TYPES(s):
+        return {"required": {"prompt": ("STRING", {"multiline": True, "placeholder": "Prompt Text"}),
+                             "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+                             "count": ("INT", {"default": 10, "min": 1, "max": 100000}),
+                             "seed_step": ("INT", {"default": 1, "min": 1, "max": 0xffffffff})},
+                "optional": {"threads": ("INT", {"default": 0, "min": 0, "max": 64, "tooltip": "Expand on a thread pool with this many workers, 0 to expand in order on the calling thread"})},
+                "hidden": {"prompt_": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"},}
+
+    RETURN_TYPES = ('STRING',)
+    OUTPUT_IS_LIST = (True,)
+    FUNCTION = 'process'
+    CATEGORY = 'Badman'
+
+    def process(self, prompt, seed, count, seed_step=1, threads=0, prompt_=None, extra_pnginfo=None):
+        if prompt_ is None:
+            prompt_ = {}
+        if extra_pnginfo is None:
+            extra_pnginfo = {}
+        seeds = [(seed + i * seed_step) & 0xffffffffffffffff for i in range(count)]
+        return (expand_wildcard_prompts(prompt, seeds, extra_pnginfo, prompt_, threads), )
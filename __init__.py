@@ -6,6 +6,7 @@ from .BadmanColorTransfer import *
 from .BadmanWildCardProcessor import *
 from .BadmanLatentNoiseMask import *
 from .BadmanWanNodes import *
+from .BadmanContextWindows import *
 from .BadmanWanOutpaintNodes import *
 
 
@@ -19,18 +20,27 @@ NODE_CLASS_MAPPINGS = {
     "Badman_Print": BadmanPrint,
     "BadmanIO" : BadmanIOConfigurator,
     "BadmanIntUtil" : BadmanIntUtil,
+    "BadmanIntListMath" : BadmanIntListMath,
     "BadmanCLIPTextEncodeSDXLRegion" : BadmanCLIPTextEncodeSDXLRegion,
+    "BadmanCLIPTextEncodeSDXLRegionBatch" : BadmanCLIPTextEncodeSDXLRegionBatch,
+    "BadmanCLIPTextEncodeSDXLCached" : BadmanCLIPTextEncodeSDXLCached,
     "BadmanStringSelect" : SelectString,
     "BadmanBrightness" : Brightness,
     "BadmanWildCardProcessor" : BadmanWildCardProcessor,
+    "BadmanWildCardBatchProcessor" : BadmanWildCardBatchProcessor,
     "BadmanDesaturate" : ImageDesaturate,
     "BadmanMaskBlur" : MaskBlur,
     "BadmanDilateErodeMask" : DilateErodeMask,
     "BadmanStringToInteger" : StringToInteger,
     "BadmanInjectLatentNoiseMasked" : InjectLatentNoiseMasked,
     "BadmanWanThreeFrameToVideo" : WanThreeFrameToVideo,
+    "BadmanWanKeyframesToVideo" : WanKeyframesToVideo,
+    "BadmanWanContextWindowCondCache" : WanContextWindowCondCache,
     "BadmanWanOutpaintFrameCalculator" : WanOutpaintFrameCalculator,
+    "BadmanWanOutpaintStageSlicer" : WanOutpaintStageSlicer,
     "BadmanSelectFromList" : BadmanSelectFromList,
+    "BadmanSelectImageFrames" : SelectImageFrames,
+    "BadmanSelectLatentFrames" : SelectLatentFrames,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -43,15 +53,24 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "Badman_Print": "Print (Badman)",
     "Badman_IO": "IO Config (Badman)",
     "BadmanIntUtil": "Int Math (Badman)",
+    "BadmanIntListMath": "Int List Math (Badman)",
+    "BadmanCLIPTextEncodeSDXLRegionBatch": "CLIP Text Encode SDXL Region Batch (Badman)",
+    "BadmanCLIPTextEncodeSDXLCached": "CLIP Text Encode SDXL Cached (Badman)",
     "BadmanStringSelect": "Select String from List (Badman)",
     "BadmanBrightness" : "Image Brightness Adjust (Badman)",
     "BadmanWildCardProcessor" : "Wildcard Processor (Badman)",
+    "BadmanWildCardBatchProcessor" : "Wildcard Batch Processor (Badman)",
     "BadmanDesaturate" : "Image Desaturate (Badman)",
     "BadmanMaskBlur" : "Mask Blur (Badman)",
     "BadmanDilateErodeMask" : "Dilate Erode Mask (Badman)",
     "BadmanStringToInteger" : "StringToInteger (Badman)",
     "BadmanInjectLatentNoiseMasked" : "Inject Latent Noise Masked (Badman)",
     "BadmanWanThreeFrameToVideo" : "WAN Three Frame To Video (Badman)",
+    "BadmanWanKeyframesToVideo" : "WAN Keyframes To Video (Badman)",
+    "BadmanWanContextWindowCondCache" : "WAN Context Window Cond Cache (Badman)",
     "BadmanWanOutpaintFrameCalculator" : "WAN Outpaint Frame Calculator (Badman)",
+    "BadmanWanOutpaintStageSlicer" : "WAN Outpaint Stage Slicer (Badman)",
     "BadmanSelectFromList" : "Select from Any List (Badman)",
+    "BadmanSelectImageFrames" : "Select Image Frames (Badman)",
+    "BadmanSelectLatentFrames" : "Select Latent Frames (Badman)",
 }
@@ -0,0 +1,31 @@
+import os
+import pathlib
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "badman_nodes"
+
+# Import the node modules as badman_nodes.<module> without running
+# __init__.py, which would load every node and all of their dependencies.
+# The tests run from a ComfyUI environment (ComfyUI on sys.path).
+if PACKAGE not in sys.modules:
+    package = types.ModuleType(PACKAGE)
+    package.__path__ = [ROOT]
+    sys.modules[PACKAGE] = package
+
+
+class _PlainRootDirectory:
+    """Collect the repo root, the custom node package, as a plain directory so its __init__.py isn't imported."""
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collect_directory(self, path, parent):
+        if path == pathlib.Path(ROOT):
+            return pytest.Dir.from_parent(parent, path=path)
+
+
+def pytest_configure(config):
+    # Registered as a plugin, conftest hooks would only apply below tests/
+    config.pluginmanager.register(_PlainRootDirectory(), "badman_plain_root")
@@ -0,0 +1,153 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("safetensors")
+pytest.importorskip("folder_paths")
+
+from badman_nodes import BadmanConditioning as conditioning
+
+
+class Tokenizer:
+    pass
+
+
+class Patcher:
+    def __init__(self):
+        self.patches = {}
+        self.patches_uuid = object()
+
+
+class FakeCLIP:
+    """CLIP stand-in with an SDXL style tokenizer, one 77 token section per 5 words of text_g."""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = Tokenizer() if tokenizer is None else tokenizer
+        self.tokenizer_options = {}
+        self.tokenize_calls = 0
+        self.encode_calls = 0
+        self.layer_idx = None
+        self.patcher = Patcher()
+        self.cond_stage_model = torch.nn.Linear(2, 2)
+
+    def tokenize(self, text, return_word_ids=False):
+        self.tokenize_calls += 1
+        words = text.split()
+        sections = [words[i:i + 5] for i in range(0, len(words), 5)] or [[]]
+        g = [[(sum(map(ord, word)), 1.0) for word in section] + [(0, 1.0)] * (77 - len(section)) for section in sections]
+        return {"g": g, "l": [[(1, 1.0)] * 77]}
+
+    def encode_from_tokens(self, tokens, return_pooled=False):
+        # Every 77 token section encodes on its own, like the SDXL text encoders
+        self.encode_calls += 1
+        g = torch.tensor([[token for token, _ in section] for section in tokens["g"]], dtype=torch.float32)
+        l = torch.tensor([[token for token, _ in section] for section in tokens["l"]], dtype=torch.float32)
+        cond = torch.cat((g.unsqueeze(-1).expand(-1, -1, 1280), l.unsqueeze(-1).expand(-1, -1, 768)), dim=-1)
+        cond = cond.reshape(1, -1, 2048)
+        return cond, cond[:, 0].clone()
+
+
+def test_cached_tokenize_hits_the_cache():
+    clip = FakeCLIP()
+    first = conditioning.cached_tokenize(clip, "a red fox")
+    assert conditioning.cached_tokenize(clip, "a red fox") == first
+    assert clip.tokenize_calls == 1
+    conditioning.cached_tokenize(clip, "a blue fox")
+    assert clip.tokenize_calls == 2
+
+
+def test_mutating_returned_tokens_keeps_the_cache_intact():
+    clip = FakeCLIP()
+    expected = clip.tokenize("a red fox")
+    tokens = conditioning.cached_tokenize(clip, "a red fox")
+    tokens["g"][0].append((5, 1.0))
+    tokens["g"].append(tokens["g"][0])
+    tokens["l"].clear()
+    del tokens["g"][0][:10]
+    assert conditioning.cached_tokenize(clip, "a red fox") == expected
+
+
+def test_clones_share_the_cache_and_options_are_part_of_the_key():
+    clip = FakeCLIP()
+    clone = FakeCLIP(clip.tokenizer)
+    conditioning.cached_tokenize(clip, "a red fox")
+    conditioning.cached_tokenize(clone, "a red fox")
+    assert clip.tokenize_calls == 1 and clone.tokenize_calls == 0
+
+    clone.tokenizer_options = {"min_padding": 4}
+    conditioning.cached_tokenize(clone, "a red fox")
+    assert clone.tokenize_calls == 1
+
+
+def test_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(conditioning, "TOKENIZE_CACHE_SIZE", 2)
+    clip = FakeCLIP()
+    for text in ("one", "two", "three"):
+        conditioning.cached_tokenize(clip, text)
+    conditioning.cached_tokenize(clip, "three")
+    assert clip.tokenize_calls == 3
+    conditioning.cached_tokenize(clip, "one")
+    assert clip.tokenize_calls == 4
+
+
+def test_tokenizer_without_weak_references_is_not_cached():
+    clip = FakeCLIP(tokenizer=object())
+    conditioning.cached_tokenize(clip, "a red fox")
+    conditioning.cached_tokenize(clip, "a red fox")
+    assert clip.tokenize_calls == 2
+
+
+def test_region_prompts_keep_their_own_length():
+    clip = FakeCLIP()
+    base = ("a fox", "a fox")
+    region = (" ".join(f"word{i}" for i in range(13)), "a region")
+    alone = [conditioning.encode_region_prompts(clip, [prompt])[0][0] for prompt in (base, region)]
+
+    cache = conditioning.ConditioningCache()
+    for _ in range(2):
+        conds, _ = conditioning.encode_region_prompts(clip, [base, region], cache)
+        assert [tuple(cond.shape) for cond in conds] == [(1, 77, 2048), (1, 231, 2048)]
+        assert all(torch.equal(cond, expected) for cond, expected in zip(conds, alone))
+    assert cache.ram_hits == 1
+
+
+def test_disk_tier_is_skipped_with_a_zero_limit(tmp_path):
+    clip = FakeCLIP()
+    tensors = {"cond": torch.rand(1, 77, 8), "sections": torch.tensor([1])}
+    conditioning.ConditioningCache().put(clip, ("sdxl", "a fox"), tensors, str(tmp_path), 0)
+    assert list(tmp_path.iterdir()) == []
+
+    conditioning.ConditioningCache().put(clip, ("sdxl", "a fox"), tensors, str(tmp_path), 2**20)
+    cached = conditioning.ConditioningCache().get(clip, ("sdxl", "a fox"), str(tmp_path))
+    assert torch.equal(cached["cond"], tensors["cond"])
+
+
+class HookedCLIP(FakeCLIP):
+    apply_hooks_to_conds = object()
+
+    def encode_from_tokens_scheduled(self, tokens, add_dict={}):
+        # Two hook keyframe ranges, each with its own cond
+        cond, pooled = self.encode_from_tokens(tokens, return_pooled=True)
+        return [[cond * scale, dict(add_dict, pooled_output=pooled * scale, clip_start_percent=start)]
+                for scale, start in ((1.0, 0.0), (2.0, 0.5))]
+
+
+def test_hooked_clip_uses_the_scheduled_encode():
+    clip = HookedCLIP()
+    cache = conditioning.CONDITIONING_CACHE
+    misses = cache.misses
+    result, _ = conditioning.BadmanCLIPTextEncodeSDXLCached().encode(clip, 1024, 1024, 0, 0, 1024, 1024, "a fox", "a fox")
+    assert [entry[1]["clip_start_percent"] for entry in result] == [0.0, 0.5]
+    assert result[0][1]["width"] == 1024
+    assert cache.misses == misses
+
+
+def test_hooked_region_batch_shares_the_base_pooled_output():
+    clip = HookedCLIP()
+    base, regions = conditioning.BadmanCLIPTextEncodeSDXLRegionBatch().encode(
+        clip, 1024, 1024, 0, 0, 1024, 1024, "a fox", "a fox", "red fur\n" + " ".join(f"word{i}" for i in range(7)))
+    assert len(regions) == 2
+    assert regions[1][0][0].shape[1] == 154
+    for region in regions:
+        assert [entry[1]["clip_start_percent"] for entry in region] == [0.0, 0.5]
+        for entry, base_entry in zip(region, base):
+            assert entry[1]["pooled_output"] is base_entry[1]["pooled_output"]
@@ -0,0 +1,273 @@
+import importlib.util
+
+import pytest
+
+torch = pytest.importorskip("torch")
+comfy_context_windows = pytest.importorskip("comfy.context_windows")
+pytest.importorskip("comfy.patcher_extension")
+
+from badman_nodes import BadmanContextWindows as cw
+
+
+class Window:
+    """Stand-in for IndexListContextWindow."""
+
+    def __init__(self, index_list, dim):
+        self.index_list = index_list
+        self.context_length = len(index_list)
+        self.dim = dim
+
+    def get_tensor(self, full, device=None, dim=None):
+        dim = self.dim if dim is None else dim
+        return full[(slice(None),) * dim + (self.index_list,)].to(device)
+
+
+class Handler:
+    """Stand-in for IndexListContextHandler with overlapping windows along dim 2."""
+
+    def __init__(self, dim=2, context_length=8, stride=6):
+        self.dim = dim
+        self.context_length = context_length
+        self.stride = stride
+
+    def get_resized_cond(self, cond_in, x_in, window, device=None):
+        raise NotImplementedError
+
+    def prepare_control_objects(self, control, device=None):
+        return control
+
+    def get_context_windows(self, model, x_in, model_options):
+        frames = x_in.size(self.dim)
+        return [Window(list(range(start, min(start + self.context_length, frames))), self.dim)
+                for start in range(0, frames, self.stride)]
+
+
+class Model:
+    """Stand-in for ModelPatcher."""
+
+    def __init__(self, model_options):
+        self.model_options = model_options
+        self.wrappers = []
+
+    def clone(self):
+        clone = Model(dict(self.model_options))
+        clone.wrappers = list(self.wrappers)
+        return clone
+
+    def add_wrapper_with_key(self, wrapper_type, key, wrapper):
+        self.wrappers.append((wrapper_type, key, wrapper))
+
+
+def load_fresh_module(monkeypatch, flag):
+    """Run BadmanContextWindows.py again as a new module with BADMAN_CONTEXT_WINDOW_FIX set to flag."""
+    if flag is None:
+        monkeypatch.delenv("BADMAN_CONTEXT_WINDOW_FIX", raising=False)
+    else:
+        monkeypatch.setenv("BADMAN_CONTEXT_WINDOW_FIX", flag)
+    spec = importlib.util.spec_from_file_location("badman_nodes._context_windows_fresh", cw.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_patch_supported_rejects_mismatched_signature(monkeypatch):
+    class MismatchedHandler(Handler):
+        def get_resized_cond(self, cond_in, x_in, window, device=None, retain_index_list=None):
+            raise NotImplementedError
+
+    monkeypatch.setattr(comfy_context_windows, "IndexListContextHandler", MismatchedHandler)
+    assert not cw.context_window_patch_supported()
+    monkeypatch.setattr(comfy_context_windows, "IndexListContextHandler", type("Handler", (Handler,), {}))
+    assert cw.context_window_patch_supported()
+
+
+def test_mismatched_signature_passes_model_through(monkeypatch):
+    monkeypatch.setattr(cw, "context_window_patch_supported", lambda: False)
+    model = Model({"context_handler": Handler()})
+    assert cw.WanContextWindowCondCache().patch(model)[0] is model
+
+
+def test_patch_leaves_source_model_and_handler_untouched(monkeypatch):
+    monkeypatch.setattr(cw, "context_window_patch_supported", lambda: True)
+    handler = Handler()
+    model = Model({"context_handler": handler})
+
+    patched = cw.WanContextWindowCondCache().patch(model, resident_budget_mb=64)[0]
+
+    assert model.model_options["context_handler"] is handler
+    assert model.wrappers == []
+    assert vars(handler) == vars(Handler())
+    patched_handler = patched.model_options["context_handler"]
+    assert patched_handler is not handler
+    assert patched_handler.badman_cond_cache.resident_budget_bytes == 64 * 2**20
+    assert [key for _, key, _ in patched.wrappers] == [cw._WRAPPER_KEY]
+
+
+def test_patch_needs_a_context_handler():
+    with pytest.raises(ValueError):
+        cw.WanContextWindowCondCache().patch(Model({}))
+
+
+@pytest.mark.parametrize("flag, installed", [("1", True), ("0", False), (None, False)])
+def test_env_flag_installs_the_global_fix(monkeypatch, flag, installed):
+    target = type("Handler", (Handler,), {})
+    monkeypatch.setattr(comfy_context_windows, "IndexListContextHandler", target)
+    module = load_fresh_module(monkeypatch, flag)
+    if installed:
+        assert target.get_resized_cond is module.fixed_get_resized_cond
+    else:
+        assert "get_resized_cond" not in vars(target)
+
+
+# Compares unequal to the device of CPU tensors, so the cache takes its move
+# path (resident copies, streamed slices) on a CPU-only host
+MOVE_DEVICE = torch.device("cpu", 0)
+FRAMES = 21
+
+
+class Cond:
+    """Stand-in for the CONDRegular/CONDConstant wrappers in model_conds."""
+
+    def __init__(self, cond):
+        self.cond = cond
+
+    def _copy_with(self, cond):
+        return Cond(cond)
+
+
+def make_conds(frames=FRAMES):
+    generator = torch.Generator().manual_seed(frames)
+
+    def rand(*shape):
+        return torch.rand(*shape, generator=generator)
+
+    concat_latent_image = rand(1, 16, frames, 4, 4)
+    concat_mask = rand(frames * 4).view(1, frames, 4, 1, 1).transpose(1, 2).expand(-1, -1, -1, 4, 4)
+    positive = [{
+        "cross_attn": rand(1, 77, 8),
+        "concat_latent_image": concat_latent_image,
+        "concat_mask": concat_mask,
+        "control": object(),
+        "strength": 1.0,
+        "model_conds": {
+            "c_concat": Cond(rand(1, 36, frames, 16, 16)),
+            "c_crossattn": Cond(rand(1, 77, 8)),
+            "y": rand(1, 16, frames, 4, 4),
+            "pooled": rand(1, 8),
+            "num_video_frames": Cond(frames),
+        },
+    }]
+    # The negative cond shares the step-invariant tensors like WAN conditioning does
+    negative = [dict(positive[0], cross_attn=rand(1, 77, 8))]
+    return [positive, negative]
+
+
+def assert_same(actual, expected):
+    if isinstance(expected, torch.Tensor):
+        assert actual.device == expected.device
+        assert torch.equal(actual, expected)
+    elif isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_same(actual[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            assert_same(a, e)
+    elif isinstance(expected, Cond):
+        assert_same(actual.cond, expected.cond)
+    else:
+        assert actual is expected or actual == expected
+
+
+def sample(handler, conds, steps, check=None):
+    """Resize conds for every window of every step like the sampler does, comparing with fixed_get_resized_cond."""
+    x_in = torch.zeros(1, 16, FRAMES, 4, 4)
+    reference = Handler()
+    for _ in range(steps):
+        for window in handler.get_context_windows(None, x_in, {}):
+            for cond in conds:
+                resized = handler.get_resized_cond(cond, x_in, window, MOVE_DEVICE)
+                assert_same(resized, cw.fixed_get_resized_cond(reference, cond, x_in, window, MOVE_DEVICE))
+                if check is not None:
+                    check(handler.badman_cond_cache)
+
+
+def cached_bytes(cache):
+    return (sum(tensor.nbytes for tensor in cache._resident.values())
+            + sum(entry[0].nbytes for slices in cache._streamed.values() for entry in slices.values()))
+
+
+def assert_within_budget(cache):
+    assert cache._cached_bytes == cached_bytes(cache)
+    assert cache._cached_bytes <= cache.resident_budget_bytes
+    assert len(cache._streamed) <= cache.stream_windows
+
+
+@pytest.mark.parametrize("budget", [0, 64 * 1024, 256 * 1024, 2**30])
+def test_cached_resize_matches_fixed_resize(budget):
+    handler = cw.install_cond_cache(Handler(), budget)
+    sample(handler, make_conds(), steps=3, check=assert_within_budget)
+
+    cache = handler.badman_cond_cache
+    assert cache.peak_cached_bytes <= budget
+    assert cache.hits + cache.misses > 0
+    cache.end_run()
+    assert cache._cached_bytes == 0
+    assert not cache._resident and not cache._streamed and not cache._sources and not cache._plans
+
+
+@pytest.mark.parametrize("context_length, stride", [(8, 6), (4, 4)])
+def test_budget_keeps_small_tensors_resident_and_streams_large_ones(context_length, stride):
+    conds = make_conds()
+    large = conds[0][0]["model_conds"]["c_concat"].cond
+    # Room for every tensor but c_concat, plus at least two windows of c_concat
+    # slices (three of the short windows, where the ring is the limit)
+    budget = 700 * 1024
+    assert large.nbytes > budget
+
+    handler = cw.install_cond_cache(Handler(context_length=context_length, stride=stride), budget)
+    streamed_windows = []
+    sample(handler, conds, steps=2, check=lambda cache: streamed_windows.append(len(cache._streamed)))
+
+    cache = handler.badman_cond_cache
+    resident = {id(tensor) for tensor in cache._sources.values() if (id(tensor), MOVE_DEVICE) in cache._resident}
+    assert id(large) not in resident
+    assert id(conds[0][0]["concat_latent_image"]) in resident
+    assert max(streamed_windows) == 2
+    assert cache.peak_cached_bytes <= budget
+
+
+def test_large_budget_moves_every_tensor_once():
+    handler = cw.install_cond_cache(Handler(), 2**30)
+    conds = make_conds()
+    sample(handler, conds, steps=3)
+
+    cache = handler.badman_cond_cache
+    assert not cache._streamed
+    moved = sum(tensor.nbytes for tensor in cache._resident.values())
+    assert cache.bytes_moved == moved
+    # Every later step is served from the resident copies
+    assert all(step["misses"] == 0 and step["bytes_moved"] == 0 for step in list(cache.step_history)[1:])
+
+
+def test_plan_is_compiled_once_and_replayed():
+    handler = cw.install_cond_cache(Handler(), 2**30)
+    conds = make_conds()
+    x_in = torch.zeros(1, 16, FRAMES, 4, 4)
+
+    sample(handler, conds, steps=1)
+    cache = handler.badman_cond_cache
+    plans = [cache.plan_for(cond, handler.dim, FRAMES) for cond in conds]
+    # cross_attn, 2 slices, control, model_conds copy, c_concat, y, pooled, num_video_frames
+    assert [len(plan.ops) for plan in plans] == [9, 9]
+
+    sample(handler, conds, steps=2)
+    assert [cache.plan_for(cond, handler.dim, FRAMES) for cond in conds] == plans
+    # A different x_in length compiles a new plan
+    assert cache.plan_for(conds[0], handler.dim, FRAMES - 1) is not plans[0]
+
+    cache.end_run()
+    windows = len(Handler().get_context_windows(None, x_in, {}))
+    assert windows == 4
+    assert [step["ops"] for step in cache.step_history] == [windows * 18] * 3
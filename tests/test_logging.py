@@ -0,0 +1,119 @@
+import logging
+import logging.handlers
+import threading
+
+import pytest
+
+from badman_nodes import BadmanLogging
+from badman_nodes.BadmanLogging import RateLimitFilter, add_rotating_file, get_logger, log_output
+
+
+def flush():
+    """Wait until the logging thread has handled everything queued so far."""
+    done = threading.Event()
+    BadmanLogging._on_listener(done.set)
+    assert done.wait(5)
+
+
+def file_handlers():
+    return [h for h in BadmanLogging._listener.handlers if isinstance(h, logging.handlers.RotatingFileHandler)]
+
+
+@pytest.fixture
+def logger():
+    logger = get_logger("tests")
+    yield logger
+    # Close the files the test opened
+    with BadmanLogging._setup_lock:
+        handlers = list(BadmanLogging._file_handlers.values())
+        BadmanLogging._file_handlers.clear()
+    for handler in handlers:
+        BadmanLogging._on_listener(lambda old=handler: BadmanLogging._swap_file_handler(old, None))
+    flush()
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_log_output_ignores_the_log_level(logger, tmp_path, monkeypatch):
+    pack = logging.getLogger(BadmanLogging.LOGGER_NAME)
+    monkeypatch.setattr(pack, "level", logging.WARNING)
+    path = add_rotating_file(tmp_path / "print.log")
+
+    logger.info("hidden", extra={"badman_console": False, "badman_file": path})
+    log_output(logger, "printed value", console=False, file=path)
+    flush()
+
+    text = read(path)
+    assert "printed value" in text
+    assert "hidden" not in text
+
+
+def test_rate_limit_lets_user_output_through():
+    limit = RateLimitFilter(messages=3, interval=60)
+
+    def record(**extra):
+        return logging.makeLogRecord({"name": "BadmanNodes", "pathname": "x.py", "lineno": 1, "msg": "m", **extra})
+
+    assert sum(limit.filter(record()) for _ in range(10)) == 3
+    assert all(limit.filter(record(badman_user_output=True)) for _ in range(10))
+
+
+def test_rotating_files_are_reused_and_capped(logger, tmp_path, monkeypatch):
+    monkeypatch.setattr(BadmanLogging, "MAX_OPEN_LOG_FILES", 2)
+    opened_before = len(file_handlers())
+    paths = []
+    for i in range(3):
+        paths.append(add_rotating_file(tmp_path / f"{i}.log"))
+        log_output(logger, f"to {i}.log", console=False, file=paths[-1])
+    first = BadmanLogging._file_handlers.get(paths[1])
+    assert add_rotating_file(tmp_path / "1.log") == paths[1]
+    assert BadmanLogging._file_handlers[paths[1]] is first
+    flush()
+
+    # The least recently used file is closed, after its queued record was written
+    assert list(BadmanLogging._file_handlers) == [paths[2], paths[1]]
+    assert len(file_handlers()) == opened_before + 2
+    assert "to 0.log" in read(paths[0])
+
+    # Using it again opens it again and appends
+    log_output(logger, "again", console=False, file=add_rotating_file(tmp_path / "0.log"))
+    flush()
+    assert read(paths[0]).count("\n") == 2
+    assert list(BadmanLogging._file_handlers) == [paths[1], paths[0]]
+    assert len(file_handlers()) == opened_before + 2
+
+
+def test_changed_rotation_settings_replace_the_handler(logger, tmp_path):
+    path = add_rotating_file(tmp_path / "a.log", max_bytes=100)
+    old = BadmanLogging._file_handlers[path]
+    add_rotating_file(tmp_path / "a.log", max_bytes=200)
+    flush()
+
+    new = BadmanLogging._file_handlers[path]
+    assert new is not old and new.maxBytes == 200
+    assert old not in file_handlers() and new in file_handlers()
+
+
+@pytest.mark.parametrize("log_file", ["../outside.log", "a/../../outside.log", "", "."])
+def test_print_refuses_paths_outside_the_output_folder(tmp_path, monkeypatch, log_file):
+    folder_paths = pytest.importorskip("folder_paths")
+    from badman_nodes.BadmanStrings import BadmanPrint
+
+    monkeypatch.setattr(folder_paths, "get_output_directory", lambda: str(tmp_path), raising=False)
+    with pytest.raises(ValueError, match="inside the output folder"):
+        BadmanPrint.output_log_path(log_file)
+    with pytest.raises(ValueError):
+        BadmanPrint.output_log_path(str(tmp_path / "absolute.log"))
+
+
+def test_print_writes_inside_the_output_folder(logger, tmp_path, monkeypatch):
+    folder_paths = pytest.importorskip("folder_paths")
+    from badman_nodes.BadmanStrings import BadmanPrint
+
+    monkeypatch.setattr(folder_paths, "get_output_directory", lambda: str(tmp_path), raising=False)
+    BadmanPrint().log_input("hello", console=False, log_file="logs/print.log")
+    flush()
+    assert "hello" in read(tmp_path / "logs" / "print.log")
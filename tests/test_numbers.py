@@ -0,0 +1,76 @@
+import pytest
+
+from badman_nodes.BadmanNumbers import BadmanIntListMath, BadmanIntUtil
+
+
+def int_list_math(a, b, operation, low=None, high=None):
+    # INPUT_IS_LIST: every input arrives as a list, optional ones may be missing.
+    return BadmanIntListMath().process(a, b, [operation],
+                                       None if low is None else [low],
+                                       None if high is None else [high])
+
+
+@pytest.mark.parametrize("a, b, operation, expected", [
+    ([1, 2, 3], [10, 20, 30], "add", [11, 22, 33]),
+    ([1, 2, 3], [10, 20, 30], "sub", [-9, -18, -27]),
+    ([1, 2, 3], [2], "multiply", [2, 4, 6]),
+    ([5], [1, 2, 3], "sub", [4, 3, 2]),
+    ([7, 8, 9], [2], "floordiv", [3, 4, 4]),
+    ([-7, 7], [2], "floordiv", [-4, 3]),
+    ([7, 8, 9], [4], "mod", [3, 0, 1]),
+    ([1, 5, 3], [4, 2, 3], "min", [1, 2, 3]),
+    ([1, 5, 3], [4], "max", [4, 5, 4]),
+])
+def test_int_list_math_broadcasts_single_values(a, b, operation, expected):
+    assert int_list_math(a, b, operation) == (expected, len(expected))
+
+
+def test_int_list_math_unwraps_single_list_values():
+    # The outpaint calculator hands its lists over as one list value.
+    assert int_list_math([[81, 81, 49]], [[0, 9, 9]], "sub") == ([81, 72, 40], 3)
+    assert int_list_math([[81, 81, 49]], [1], "add") == ([82, 82, 50], 3)
+
+
+def test_int_list_math_rejects_mismatched_lengths():
+    with pytest.raises(ValueError, match="broadcast"):
+        int_list_math([1, 2, 3], [1, 2], "add")
+
+
+@pytest.mark.parametrize("operation", ["floordiv", "mod"])
+def test_int_list_math_rejects_division_by_zero(operation):
+    with pytest.raises(ValueError, match="divide by zero"):
+        int_list_math([4, 5], [2, 0], operation)
+    with pytest.raises(ValueError, match="divide by zero"):
+        int_list_math([4, 5], [0], operation)
+
+
+def test_int_list_math_clamps_to_bounds():
+    assert int_list_math([-5, 0, 3, 9, 12], [0], "clamp", low=0, high=9) == ([0, 0, 3, 9, 9], 5)
+    # b is ignored by clamp, whatever its length.
+    assert int_list_math([4, 20], [1, 2, 3], "clamp", low=5, high=10) == ([5, 10], 2)
+    # Missing bounds default to 0.
+    assert int_list_math([-1, 3], [0], "clamp") == ([0, 0], 2)
+
+
+def test_int_list_math_rejects_inverted_clamp_bounds():
+    with pytest.raises(ValueError, match="greater than high"):
+        int_list_math([1, 2], [0], "clamp", low=5, high=1)
+
+
+def test_int_list_math_rejects_empty_lists_and_unknown_operations():
+    with pytest.raises(ValueError, match="empty list"):
+        int_list_math([], [1], "add")
+    with pytest.raises(ValueError, match="Unsupported"):
+        int_list_math([1], [1], "pow")
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("add", 9), ("multiply", 14), ("sub", 5), ("divide", 3),
+])
+def test_int_util_math_modes(mode, expected):
+    assert BadmanIntUtil().process_int(7, 2, mode) == (expected,)
+
+
+def test_int_util_rejects_division_by_zero():
+    with pytest.raises(ValueError, match="divide by zero"):
+        BadmanIntUtil().process_int(7, 0, "divide")
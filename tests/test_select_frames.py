@@ -0,0 +1,89 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchvision")
+pytest.importorskip("cv2")
+pytest.importorskip("comfy.utils")
+
+from badman_nodes.BadmanImage import SelectLatentFrames, parse_index_spec, select_batch
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("3", slice(3, 4)),
+    ("-1", slice(4, 5)),
+    ("-5", slice(0, 1)),
+    ("2:4", slice(2, 4)),
+    ("::2", slice(None, None, 2)),
+    ("-2:", slice(-2, None)),
+    ("1:100", slice(1, 100)),
+    ("::-1", [4, 3, 2, 1, 0]),
+    ("0,4,1:3", [0, 4, 1, 2]),
+    (" 4 , -1 ,", [4, 4]),
+])
+def test_parse_index_spec(spec, expected):
+    assert parse_index_spec(spec, 5) == expected
+
+
+@pytest.mark.parametrize("spec", ["5", "-6", "0,7"])
+def test_parse_index_spec_rejects_out_of_range_indices(spec):
+    with pytest.raises(IndexError):
+        parse_index_spec(spec, 5)
+
+
+@pytest.mark.parametrize("spec", ["", " , ", "a", "1.5", "1:2:3:4"])
+def test_parse_index_spec_rejects_invalid_input(spec):
+    with pytest.raises(ValueError):
+        parse_index_spec(spec, 5)
+
+
+def test_ranges_are_views():
+    images = torch.rand(6, 4, 4, 3)
+    selected = select_batch(images, "1:4")
+    assert selected.data_ptr() == images[1].data_ptr()
+    assert torch.equal(selected, images[1:4])
+
+    strided = select_batch(images, "::2")
+    assert strided.data_ptr() == images.data_ptr()
+    assert torch.equal(strided, images[::2])
+
+    copied = select_batch(images, "::2", contiguous=True)
+    assert copied.is_contiguous() and copied.data_ptr() != images.data_ptr()
+    assert torch.equal(copied, images[::2])
+
+
+def test_index_lists_are_gathered():
+    images = torch.rand(6, 4, 4, 3)
+    selected = select_batch(images, "-1,0,2:4")
+    assert selected.is_contiguous()
+    assert torch.equal(selected, images[[5, 0, 2, 3]])
+
+
+def test_select_along_other_dims():
+    latent = torch.rand(1, 16, 9, 2, 2)
+    assert torch.equal(select_batch(latent, "-3:", dim=2), latent[:, :, 6:])
+
+
+@pytest.mark.parametrize("spec", ["10:20", "3:1", "::0"])
+def test_empty_or_zero_step_selection(spec):
+    with pytest.raises(ValueError):
+        select_batch(torch.rand(5, 2), spec)
+
+
+def test_latent_extras_follow_the_selection():
+    samples = {"samples": torch.rand(4, 4, 8, 8), "noise_mask": torch.rand(4, 1, 8, 8), "batch_index": [10, 11, 12, 13]}
+    out, count = SelectLatentFrames().execute(samples, "3,1", "batch")
+    assert count == 2
+    assert torch.equal(out["samples"], samples["samples"][[3, 1]])
+    assert torch.equal(out["noise_mask"], samples["noise_mask"][[3, 1]])
+    assert out["batch_index"] == [13, 11]
+
+    out, count = SelectLatentFrames().execute(samples, "::2", "batch")
+    assert out["batch_index"] == [10, 12]
+
+
+def test_latent_frames_need_a_video_latent():
+    video = {"samples": torch.rand(1, 16, 9, 2, 2)}
+    out, count = SelectLatentFrames().execute(video, "0:3", "frames")
+    assert count == 3 and out["samples"].shape == (1, 16, 3, 2, 2)
+    with pytest.raises(ValueError):
+        SelectLatentFrames().execute({"samples": torch.rand(4, 4, 8, 8)}, "0", "frames")
@@ -0,0 +1,73 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("comfy.utils")
+pytest.importorskip("node_helpers")
+
+from badman_nodes.BadmanWanNodes import WanKeyframesToVideo, WanThreeFrameToVideo, keyframe_regions
+
+SIZE = 16
+
+
+class RecordingVAE:
+    latent_channels = 16
+
+    def spacial_compression_encode(self):
+        return 8
+
+    def encode(self, image):
+        self.image = image.clone()
+        return torch.zeros(1, self.latent_channels, (image.shape[0] - 1) // 4 + 1, image.shape[1] // 8, image.shape[2] // 8)
+
+
+def run_three_frame(keyframes, length, frame_blend_width):
+    vae = RecordingVAE()
+    cond = [[torch.zeros(1, 77, 8), {}]]
+    positive, _, _, _ = WanThreeFrameToVideo().execute(
+        cond, cond, vae, SIZE, SIZE, length, 1, 0.5, frame_blend_width,
+        keyframes[0:1], keyframes[1:2], keyframes[2:3])
+    return positive[0][1]["concat_mask"], vae.image
+
+
+def run_keyframes(keyframes, positions, length, frame_blend_width):
+    vae = RecordingVAE()
+    cond = [[torch.zeros(1, 77, 8), {}]]
+    positive, _, _, _ = WanKeyframesToVideo().execute(
+        cond, cond, vae, keyframes, positions, SIZE, SIZE, length, 1, frame_blend_width)
+    return positive[0][1]["concat_mask"], vae.image
+
+
+def test_regions_hold_at_least_one_frame():
+    starts, ends = keyframe_regions(torch.tensor([0, 10, 20]), 21, 1)
+    assert starts.tolist() == [0, 10, 20]
+    assert ends.tolist() == [1, 11, 21]
+
+
+@pytest.mark.parametrize("length", [1, 5, 33, 81])
+@pytest.mark.parametrize("frame_blend_width", [2, 3, 8])
+def test_three_keyframes_match_three_frame_node(length, frame_blend_width):
+    keyframes = torch.rand(3, SIZE, SIZE, 3, generator=torch.Generator().manual_seed(length))
+    positions = f"0,{int(length * 0.5)},{length - 1}"
+
+    mask, image = run_keyframes(keyframes, positions, length, frame_blend_width)
+    expected_mask, expected_image = run_three_frame(keyframes, length, frame_blend_width)
+
+    assert torch.equal(mask, expected_mask)
+    assert torch.equal(image, expected_image)
+
+
+def test_single_frame_video_masks_like_three_frame_node():
+    keyframes = torch.rand(3, SIZE, SIZE, 3)
+    mask, _ = run_keyframes(keyframes, "0,0,0", 1, 8)
+    expected_mask, _ = run_three_frame(keyframes, 1, 8)
+    assert torch.equal(mask, expected_mask)
+    assert not mask.any()
+
+
+def test_middle_keyframe_is_held_with_blend_width_one():
+    keyframes = torch.rand(3, SIZE, SIZE, 3)
+    mask, image = run_keyframes(keyframes, "0,4,8", 9, 1)
+    for keyframe, position in zip(keyframes, [0, 4, 8]):
+        assert torch.allclose(image[position], keyframe)
+        assert mask[0, position % 4, position // 4, 0, 0] == 0.0
+    assert torch.equal(image[5], torch.full((SIZE, SIZE, 3), 0.5))
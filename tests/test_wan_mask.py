@@ -0,0 +1,94 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("comfy.utils")
+pytest.importorskip("node_helpers")
+
+from badman_nodes.BadmanWanNodes import WanThreeFrameToVideo, expand_mask_profile
+
+
+def dense_concat_mask(mask_profile, latent_height, latent_width):
+    # Previous implementation: full (1, 1, T*4, H, W) mask reshaped to (1, 4, T, H, W)
+    mask = mask_profile.view(1, 1, -1, 1, 1).repeat(1, 1, 1, latent_height, latent_width)
+    return mask.view(1, mask.shape[2] // 4, 4, mask.shape[3], mask.shape[4]).transpose(1, 2)
+
+
+@pytest.mark.parametrize("latent_frames, latent_height, latent_width", [(1, 4, 4), (21, 60, 104), (41, 8, 6)])
+def test_profile_view_matches_dense_mask(latent_frames, latent_height, latent_width):
+    generator = torch.Generator().manual_seed(latent_frames)
+    mask_profile = (torch.rand(latent_frames * 4, generator=generator) > 0.5).float()
+
+    view = expand_mask_profile(mask_profile, latent_height, latent_width)
+    dense = dense_concat_mask(mask_profile, latent_height, latent_width)
+
+    assert view.shape == dense.shape == (1, 4, latent_frames, latent_height, latent_width)
+    assert torch.equal(view, dense)
+    # What the sampler does with the concat mask
+    assert torch.equal(1.0 - view, 1.0 - dense)
+    window = torch.arange(0, latent_frames, 2)
+    assert torch.equal(view.index_select(2, window), dense.index_select(2, window))
+    resized = (latent_frames, latent_height * 2, latent_width * 2)
+    assert torch.equal(torch.nn.functional.interpolate(view, size=resized, mode="nearest-exact"),
+                       torch.nn.functional.interpolate(dense, size=resized, mode="nearest-exact"))
+
+
+def test_keyframe_mask_profile_matches_dense_mask():
+    # Mask of a start, middle and end keyframe as WanThreeFrameToVideo built it
+    length, width, latent_height, latent_width = 81, 8, 60, 104
+    latent_frames = (length - 1) // 4 + 1
+    mask_profile = torch.ones(latent_frames * 4)
+    mask_profile[:width + 3] = 0.0
+    mask_profile[40 - width // 2:40 + width // 2 + 3] = 0.0
+    mask_profile[length - width:length] = 0.0
+
+    dense = torch.ones((1, 1, latent_frames * 4, latent_height, latent_width))
+    dense[:, :, :width + 3] = 0.0
+    dense[:, :, 40 - width // 2:40 + width // 2 + 3] = 0.0
+    dense[:, :, length - width:length] = 0.0
+    dense = dense.view(1, latent_frames, 4, latent_height, latent_width).transpose(1, 2)
+
+    assert torch.equal(expand_mask_profile(mask_profile, latent_height, latent_width), dense)
+
+
+class EncodingVAE:
+    latent_channels = 16
+
+    def spacial_compression_encode(self):
+        return 8
+
+    def encode(self, image):
+        return torch.zeros(1, self.latent_channels, (image.shape[0] - 1) // 4 + 1, image.shape[1] // 8, image.shape[2] // 8)
+
+
+def dense_three_frame_mask(length, latent_height, latent_width, middle_frame_position, frame_blend_width, start, middle, end):
+    # Mask construction of WanThreeFrameToVideo before the profile rework
+    mask_temporal_dim = ((length - 1) // 4 + 1) * 4
+    mask = torch.ones((1, 1, mask_temporal_dim, latent_height, latent_width))
+    if start:
+        mask[:, :, :min(frame_blend_width, length) + 3] = 0.0
+    if middle:
+        middle_frame_idx = int(length * middle_frame_position)
+        middle_start = max(0, middle_frame_idx - frame_blend_width // 2)
+        middle_end = min(length, middle_frame_idx + frame_blend_width // 2)
+        mask[:, :, middle_start:min(middle_end + 3, mask_temporal_dim)] = 0.0
+    if end:
+        mask[:, :, max(0, length - frame_blend_width):min(length, mask_temporal_dim)] = 0.0
+    return mask.view(1, mask.shape[2] // 4, 4, mask.shape[3], mask.shape[4]).transpose(1, 2)
+
+
+@pytest.mark.parametrize("length, middle_frame_position, frame_blend_width", [(81, 0.5, 8), (33, 0.3, 3), (5, 0.5, 1), (1, 0.5, 8)])
+@pytest.mark.parametrize("start, middle, end", [(True, True, True), (True, False, False), (False, True, True), (False, False, False)])
+def test_three_frame_concat_mask_matches_dense_mask(length, middle_frame_position, frame_blend_width, start, middle, end):
+    height, width = 48, 32
+    image = torch.rand(1, height, width, 3)
+    cond = [[torch.zeros(1, 77, 8), {}]]
+    positive, negative, latent, _ = WanThreeFrameToVideo().execute(
+        cond, cond, EncodingVAE(), width, height, length, 1, middle_frame_position, frame_blend_width,
+        start_image=image if start else None, middle_image=image if middle else None, end_image=image if end else None)
+
+    samples = latent["samples"]
+    dense = dense_three_frame_mask(length, samples.shape[-2], samples.shape[-1], middle_frame_position, frame_blend_width, start, middle, end)
+    for conditioning in (positive, negative):
+        concat_mask = conditioning[0][1]["concat_mask"]
+        assert concat_mask.shape == dense.shape
+        assert torch.equal(concat_mask, dense)
@@ -0,0 +1,116 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from badman_nodes.BadmanWanOutpaintNodes import (
+    greedy_outpaint_schedule,
+    is_valid_wan_frame_count,
+    largest_valid_wan_frame_count,
+    plan_stage_ranges,
+    slice_frames,
+    solve_outpaint_schedule,
+    stage_context,
+    stage_dependencies,
+)
+
+CASES = [
+    (total_frames, max_generation_length, min_context, additional_context)
+    for total_frames in (82, 97, 100, 161, 170, 250, 333, 481)
+    for max_generation_length, min_context, additional_context in ((81, 9, None), (81, 5, [0, 0, 8]), (49, 13, None))
+]
+
+
+def assert_valid_schedule(schedule, total_frames, max_generation_length, min_context, additional_context):
+    generation_lengths, context_frames, start_positions = schedule
+    max_length = largest_valid_wan_frame_count(max_generation_length)
+    assert context_frames[0] == 0 and start_positions[0] == 0
+    covered = 0
+    for i, (length, ctx_frames, start) in enumerate(zip(generation_lengths, context_frames, start_positions)):
+        assert is_valid_wan_frame_count(length) and length <= max_length
+        assert start == covered
+        if i < len(generation_lengths) - 1:
+            assert ctx_frames == stage_context(i, min_context, additional_context)
+        else:
+            assert ctx_frames >= stage_context(i, min_context, additional_context)
+        covered += length - ctx_frames
+    assert covered == total_frames
+
+
+@pytest.mark.parametrize("total_frames, max_generation_length, min_context, additional_context", CASES)
+def test_min_generated_frames_never_generates_more_than_greedy(total_frames, max_generation_length, min_context, additional_context):
+    greedy = greedy_outpaint_schedule(total_frames, max_generation_length, min_context, additional_context)
+    solved = solve_outpaint_schedule(total_frames, max_generation_length, min_context, additional_context, "min_generated_frames")
+
+    assert_valid_schedule(greedy, total_frames, max_generation_length, min_context, additional_context)
+    assert_valid_schedule(solved, total_frames, max_generation_length, min_context, additional_context)
+    assert sum(solved[0]) <= sum(greedy[0])
+    if sum(solved[0]) == sum(greedy[0]):
+        assert len(solved[0]) <= len(greedy[0])
+
+
+@pytest.mark.parametrize("total_frames, max_generation_length, min_context, additional_context", CASES)
+def test_min_stages_never_uses_more_stages_than_greedy(total_frames, max_generation_length, min_context, additional_context):
+    greedy = greedy_outpaint_schedule(total_frames, max_generation_length, min_context, additional_context)
+    solved = solve_outpaint_schedule(total_frames, max_generation_length, min_context, additional_context, "min_stages")
+
+    assert_valid_schedule(solved, total_frames, max_generation_length, min_context, additional_context)
+    assert len(solved[0]) <= len(greedy[0])
+
+
+def test_min_generated_frames_avoids_a_short_last_stage():
+    # Greedy emits two full chunks and a 17 frame stage for the last 8 frames,
+    # the solver generates as many frames in evenly sized stages
+    assert greedy_outpaint_schedule(161) == ([81, 81, 17], [0, 9, 9], [0, 81, 153])
+    assert solve_outpaint_schedule(161) == ([57, 61, 61], [0, 9, 9], [0, 57, 109])
+
+
+def test_video_that_fits_one_stage():
+    for objective in ("min_generated_frames", "min_stages", "min_compute"):
+        assert solve_outpaint_schedule(50, objective=objective) == ([53], [0], [0])
+    assert greedy_outpaint_schedule(50) == ([53], [0], [0])
+
+
+def test_unknown_objective():
+    with pytest.raises(ValueError):
+        solve_outpaint_schedule(200, objective="fastest")
+
+
+def test_stage_dependencies():
+    assert stage_dependencies([0, 9, 9]) == ([True, False, False], [0, 1, 2])
+    # A stage without context starts a new chain
+    assert stage_dependencies([0, 9, 0, 13]) == ([True, False, True, False], [0, 1, 0, 1])
+    assert stage_dependencies([0, 9, 9], context_from="source") == ([True, True, True], [0, 0, 0])
+
+
+def test_plan_stage_ranges():
+    generation_lengths, context_frames, start_positions = solve_outpaint_schedule(161)
+    plan = {"generation_lengths": generation_lengths, "context_frames": context_frames, "start_positions": start_positions}
+    assert plan_stage_ranges(plan, 161) == [(0, 57, 0), (48, 109, 0), (100, 161, 0)]
+    # A single stage rounded up to a valid length pads past the end
+    assert plan_stage_ranges({"generation_lengths": [53], "context_frames": [0], "start_positions": [0]}, 50) == [(0, 50, 3)]
+    with pytest.raises(ValueError):
+        plan_stage_ranges(plan, 90)
+
+
+def test_slice_frames_is_a_view_without_padding():
+    frames = torch.rand(10, 4, 4, 3)
+    chunk = slice_frames(frames, 2, 7, 0)
+    assert chunk.shape[0] == 5
+    assert chunk.data_ptr() == frames[2].data_ptr()
+    assert torch.equal(chunk, frames[2:7])
+
+
+def test_slice_frames_repeats_the_last_frame():
+    frames = torch.rand(10, 4, 4, 3)
+    chunk = slice_frames(frames, 6, 10, 3)
+    assert chunk.shape[0] == 7
+    assert torch.equal(chunk[:4], frames[6:10])
+    assert all(torch.equal(frame, frames[9]) for frame in chunk[4:])
+
+
+def test_slice_frames_broadcasts_a_single_frame():
+    frames = torch.rand(1, 4, 4, 3)
+    chunk = slice_frames(frames, 20, 40, 1)
+    assert chunk.shape == (21, 4, 4, 3)
+    assert chunk.stride(0) == 0
+    assert all(torch.equal(frame, frames[0]) for frame in chunk)
@@ -0,0 +1,50 @@
+import json
+import os
+import random
+
+import pytest
+
+pytest.importorskip("folder_paths")
+
+from badman_nodes import BadmanWildCardProcessor as wildcards
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+with open(os.path.join(FIXTURES, "wildcard_golden.json"), encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+# A 10 KB prompt of nested choices around wildcards
+with open(os.path.join(FIXTURES, "wildcard_nested_golden.json"), encoding="utf-8") as f:
+    NESTED_GOLDEN = json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def fixture_wildcards(monkeypatch):
+    monkeypatch.setattr(wildcards, "WILDCARD_STORE", wildcards.WildcardStore(root=os.path.join(FIXTURES, "wildcards")))
+
+
+@pytest.mark.parametrize("case", GOLDEN, ids=[f"{case['prompt']}-{case['seed']}" for case in GOLDEN])
+def test_processor_matches_golden_output(case):
+    assert wildcards.BadmanWildCardProcessor().process(case["prompt"], case["seed"]) == (case["expected"],)
+
+
+def test_batch_matches_golden_output():
+    for case in GOLDEN:
+        assert wildcards.expand_wildcard_prompts(case["prompt"], [case["seed"]]) == [case["expected"]]
+
+
+@pytest.mark.parametrize("case", NESTED_GOLDEN["cases"], ids=lambda case: str(case["seed"]))
+def test_long_nested_prompt_matches_golden_output(case):
+    assert wildcards.expand_wildcard_prompt(NESTED_GOLDEN["prompt"], case["seed"]) == case["expected"]
+
+
+@pytest.mark.parametrize("depth", [8, 9, 300])
+def test_deep_nesting_draws_like_the_brace_stack(depth):
+    # Past the regex sweeps the stack expander takes over with the same random state
+    text = "core"
+    for level in range(depth):
+        text = "{a%d|%s|b%d}" % (level, text, level)
+    for seed in range(10):
+        expanded = wildcards.process_wildcard_syntax(text, seed)
+        assert expanded == wildcards.expand_brace_groups(text, random.Random(seed), weighted=False)
+        assert "{" not in expanded and "|" not in expanded